@@ -0,0 +1,77 @@
+import os
+import json
+import time
+import pygame
+from collections import OrderedDict
+
+GLYPH_CACHE_SIZE = 512
+# resolved system font paths, finding a font by name scans every installed font (fc-list on Linux),
+# kept per user rather than in whatever directory the game runs from
+CACHE_DIR = os.path.join(os.environ.get('LOCALAPPDATA') or os.environ.get('XDG_CACHE_HOME')
+                         or os.path.join(os.path.expanduser('~'), '.cache'), 'sudoku')
+FONT_CACHE = os.path.join(CACHE_DIR, 'fonts.json')
+# a font found missing is looked for again after a day, in case it has been installed since
+FONT_MISS_TTL = 24 * 60 * 60
+
+fonts = {}
+font_paths = None
+images = {}
+glyphs = OrderedDict()
+
+
+def load_font_paths():
+    try:
+        with open(FONT_CACHE) as file:
+            paths = json.load(file)
+    except (OSError, ValueError):
+        return {}
+    return paths if isinstance(paths, dict) else {}
+
+
+def find_font(name):
+    # the cache maps a font to its path, or to the time it was found missing; pygame's default
+    # font stands in for a missing one without a new scan until FONT_MISS_TTL has passed
+    global font_paths
+    if font_paths is None:
+        font_paths = load_font_paths()
+    entry = font_paths.get(name)
+    if isinstance(entry, str) and os.path.exists(entry):
+        return entry
+    if isinstance(entry, float) and 0 <= time.time() - entry < FONT_MISS_TTL:
+        return None
+    path = pygame.font.match_font(name)
+    font_paths[name] = path if path is not None else time.time()
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(FONT_CACHE, 'w') as file:
+            json.dump(font_paths, file)
+    except OSError:
+        pass
+    return path
+
+
+def get_font(name, size):
+    key = (name, size)
+    font = fonts.get(key)
+    if font is None:
+        font = fonts[key] = pygame.font.Font(find_font(name), size)
+    return font
+
+
+def load_image(path):
+    image = images.get(path)
+    if image is None:
+        image = images[path] = pygame.image.load(path)
+    return image
+
+
+def render_text(text, color, font, size, antialias=True):
+    key = (text, color, font, size, antialias)
+    surface = glyphs.get(key)
+    if surface is None:
+        surface = glyphs[key] = get_font(font, size).render(text, antialias, color)
+        if len(glyphs) > GLYPH_CACHE_SIZE:
+            glyphs.popitem(last=False)
+    else:
+        glyphs.move_to_end(key)
+    return surface
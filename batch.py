@@ -0,0 +1,227 @@
+import sys
+import time
+import argparse
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+import grid
+import solver
+from board import Board
+
+# boards handed to the scalar search by solve() since import
+searched = 0
+
+CHUNK_SIZE = 10000
+
+
+def check_numpy():
+    if np is None:
+        raise ImportError('batch validation and solving need numpy (pip install numpy)')
+
+
+def batch_geometry(boards):
+    if boards.ndim != 3 or boards.shape[1] != boards.shape[2]:
+        raise ValueError(f'Expected an (N, size, size) array, got shape {boards.shape}')
+    return grid.geometry_for(boards.shape[1] * boards.shape[2])
+
+
+def split(boards, geometry):
+    # (N, size, size) to (N, band, row, stack, col) so unit reductions are plain axis reductions
+    box_size = geometry.box_size
+    return boards.reshape(len(boards), box_size, box_size, box_size, box_size)
+
+
+# axes that run along a row, a column and a box of the split layout
+UNIT_AXES = ((3, 4), (1, 2), (2, 4))
+
+
+def validate(boards):
+    check_numpy()
+    boards = np.asarray(boards, dtype=np.uint8)
+    g = batch_geometry(boards)
+    planes = split(boards, g)[..., None] == np.arange(1, g.size + 1, dtype=np.uint8)
+    valid = (boards <= g.size).all(axis=(1, 2))
+    for axes in UNIT_AXES:
+        valid &= (planes.sum(axis=axes, dtype=np.uint8) <= 1).reshape(len(boards), -1).all(axis=1)
+    return valid
+
+
+def unit_slices(axes, box_size):
+    # index of every cell of a unit along the given axes, keeping the dimensions for broadcasting
+    for i in range(box_size):
+        for j in range(box_size):
+            index = [slice(None)] * 5
+            index[axes[0]] = slice(i, i + 1)
+            index[axes[1]] = slice(j, j + 1)
+            yield tuple(index)
+
+
+def candidates(cells, geometry):
+    # candidate bitmask per cell of the split layout, bit d for digit d, 0 for filled cells
+    dtype = np.uint16 if geometry.size < 16 else np.uint32
+    bits = np.left_shift(dtype(1), cells, dtype=dtype)
+    bits[cells == 0] = 0
+    used = np.zeros_like(bits)
+    for axes in UNIT_AXES:
+        unit = np.zeros_like(bits[:, :1, :1, :1, :1])
+        for index in unit_slices(axes, geometry.box_size):
+            unit = unit | bits[index]
+        used |= unit
+    cand = ~used & dtype(geometry.all)
+    cand[cells != 0] = 0
+    return cand
+
+
+def hidden_singles(cand, geometry):
+    # digits with exactly one place in the row, column or box of each cell
+    hidden = np.zeros_like(cand)
+    for axes in UNIT_AXES:
+        once = np.zeros_like(cand[:, :1, :1, :1, :1])
+        twice = np.zeros_like(once)
+        for index in unit_slices(axes, geometry.box_size):
+            value = cand[index]
+            twice = twice | once & value
+            once = once | value
+        hidden |= once & ~twice
+    return cand & hidden
+
+
+def propagate(boards, geometry):
+    # fills naked and hidden singles across the whole batch in place until nothing changes,
+    # returns False for boards that ran into an empty cell without candidates
+    alive = np.ones(len(boards), dtype=bool)
+    active = np.arange(len(boards))
+    while active.size:
+        work = split(boards[active], geometry)
+        cand = candidates(work, geometry)
+        dead = ((cand == 0) & (work == 0)).any(axis=(1, 2, 3, 4))
+
+        hidden = hidden_singles(cand, geometry)
+        naked = cand & (cand - 1) == 0
+        # the lowest hidden digit wins, two of them in one cell is a contradiction the final check catches
+        single = np.where(naked, cand, hidden & (~hidden + 1))
+        values = np.where(single != 0, np.frexp(single)[1] - 1, 0).astype(np.uint8)
+
+        changed = (values != 0).any(axis=(1, 2, 3, 4)) & ~dead
+        boards[active] = (work + values).reshape(len(active), geometry.size, geometry.size)
+        alive[active[dead]] = False
+        active = active[changed]
+    return alive
+
+
+def solve(boards):
+    # returns the solved boards and a mask of the ones that have a solution, unsolved boards come back unchanged
+    global searched
+    check_numpy()
+    original = np.asarray(boards, dtype=np.uint8)
+    g = batch_geometry(original)
+    solutions = original.copy()
+    solved = np.zeros(len(solutions), dtype=bool)
+
+    pending = np.flatnonzero(validate(solutions))
+    work = solutions[pending]
+    alive = propagate(work, g) & validate(work)
+    complete = (work != 0).all(axis=(1, 2))
+    solutions[pending] = work
+    solved[pending[alive & complete]] = True
+
+    # only what propagation could not finish goes through the scalar search
+    for n in pending[alive & ~complete]:
+        board = Board(solutions[n].tobytes(), g)
+        searched += 1
+        if solver.solve(board):
+            solutions[n] = np.frombuffer(bytes(board.cells), dtype=np.uint8).reshape(g.size, g.size)
+            solved[n] = True
+    solutions[~solved] = original[~solved]
+    return solutions, solved
+
+
+def symbol_table(decode):
+    # translation between line symbols and cell values, unknown symbols decode out of range
+    table = bytearray(range(256)) if not decode else bytearray(b'\xff' * 256)
+    for value, symbol in enumerate(grid.SYMBOLS, 1):
+        if decode:
+            table[ord(symbol)] = table[ord(symbol.lower())] = value
+        else:
+            table[value] = ord(symbol)
+    if decode:
+        table[ord('0')] = table[ord('.')] = 0
+    else:
+        table[0] = ord('0')
+    return bytes(table)
+
+
+DECODE = symbol_table(True)
+ENCODE = symbol_table(False)
+
+
+def from_lines(lines):
+    # standard line format, the first field of each line is the board
+    check_numpy()
+    fields = [line.split(maxsplit=1)[0].encode() for line in lines]
+    size = grid.geometry_for(len(fields[0])).size
+    for field in fields:
+        if len(field) != size * size:
+            raise ValueError(f'{field.decode()!r} is not a {size}x{size} board')
+    return np.frombuffer(b''.join(fields).translate(DECODE), dtype=np.uint8).reshape(len(fields), size, size)
+
+
+def to_lines(boards):
+    cells = np.ascontiguousarray(boards, dtype=np.uint8).reshape(len(boards), -1)
+    return [row.tobytes().translate(ENCODE).decode() for row in cells]
+
+
+def read_chunks(source, chunk_size):
+    chunk = []
+    for line in source:
+        if line.strip():
+            chunk.append(line)
+            if len(chunk) == chunk_size:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Validate and solve a puzzle corpus in NumPy batches.')
+    parser.add_argument('input', nargs='?', default='-', help="puzzles one per line, '-' for stdin")
+    parser.add_argument('-o', '--output', default=None, help="write 'puzzle solution' lines here, '-' for stdout")
+    parser.add_argument('-c', '--chunk-size', type=int, default=CHUNK_SIZE, help='boards per batch')
+    args = parser.parse_args(argv)
+    check_numpy()
+
+    source = sys.stdin if args.input == '-' else open(args.input)
+    output = None if args.output is None else sys.stdout if args.output == '-' else open(args.output, 'w')
+    total = invalid = unsolved = 0
+    start = time.perf_counter()
+    try:
+        for chunk in read_chunks(source, args.chunk_size):
+            try:
+                boards = from_lines(chunk)
+            except ValueError as error:
+                parser.exit(2, f'{error}\n')
+            valid = validate(boards)
+            solutions, solved = solve(boards)
+            total += len(boards)
+            invalid += int((~valid).sum())
+            unsolved += int((valid & ~solved).sum())
+            if output is not None:
+                output.writelines(f'{puzzle} {solution if ok else "-"}\n' for puzzle, solution, ok
+                                  in zip(to_lines(boards), to_lines(solutions), solved))
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if output is not None and output is not sys.stdout:
+            output.close()
+    elapsed = time.perf_counter() - start
+    print(f'{total} boards in {elapsed:.2f}s ({total / max(elapsed, 1e-9):.0f} boards/s): '
+          f'{invalid} invalid, {unsolved} without a solution, {searched} needed search', file=sys.stderr)
+    return 1 if invalid or unsolved else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,211 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import subprocess
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import grid
+import solver
+import dlx
+from board import Board
+from grid import DIFFICULTIES
+from generator import PuzzleGenerator
+
+# puzzles with a unique solution that are known to be hard for backtracking solvers
+HARD_PUZZLES = {
+    'hard-1': '8..........36......7..9.2...5...7.......457.....1...3...1....68..85...1..9....4..',
+    'hard-2': '1.......2.9.4...5...6...7...5.9.3.......7.......85..4.7.....6...3...9.8...2.....1',
+    'hard-3': '1....7.9..3..2...8..96..5....53..9...1..8...26....4...3......1..4......7..7...3..',
+    'hard-4': '..53.....8......2..7..1.5..4....53...1..7...6..32...8..6.5....9..4....3......97..',
+    'hard-5': '4.....8.5.3..........7......2.....6.....8.4......1.......6.3.7.5..2.....1.4......',
+    'hard-6': '..............3.85..1.2.......5.7.....4...1...9.......5......73..2.1........4...9'
+}
+BACKENDS = {
+    'bitmask': solver,
+    'dlx': dlx
+}
+SECTIONS = ('solve', 'generate', 'render', 'startup')
+# launches the game in a fresh interpreter, quits on the first event and prints the time to its first frame
+STARTUP_SCRIPT = '''
+import main
+import pygame
+game = main.SudokuGame()
+pygame.event.post(pygame.event.Event(pygame.QUIT))
+game.start()
+print(game.first_frame)
+'''
+# time to first frame the game aims for, only enforced when --startup-budget asks for it
+STARTUP_BUDGET_MS = 200
+DEFAULT_TOLERANCE = 0.25
+# slowdowns smaller than this are timer noise, not regressions
+MIN_DELTA_MS = 0.05
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(q / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(samples):
+    return {
+        'runs': len(samples),
+        'min_ms': min(samples) * 1000,
+        'p50_ms': percentile(samples, 50) * 1000,
+        'p90_ms': percentile(samples, 90) * 1000,
+        'p99_ms': percentile(samples, 99) * 1000,
+        'max_ms': max(samples) * 1000,
+        'mean_ms': sum(samples) / len(samples) * 1000
+    }
+
+
+def measure(func, repeat):
+    samples = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def bench_solve(results, repeat, seed):
+    for backend_name, backend in BACKENDS.items():
+        for name, line in HARD_PUZZLES.items():
+            board = Board.from_rows(grid.from_line(line))
+            samples = measure(lambda: backend.solve(board.copy()), repeat)
+            results[f'solve/{backend_name}/{name}'] = summarize(samples)
+
+
+def bench_generate(results, repeat, seed):
+    for difficulty in DIFFICULTIES:
+        generator = PuzzleGenerator(random.Random(seed))
+        samples = measure(lambda: generator.generate(difficulty), repeat)
+        stats = summarize(samples)
+        stats['per_second'] = len(samples) / sum(samples)
+        results[f'generate/{difficulty}'] = stats
+
+
+def bench_render(results, repeat, seed):
+    import pygame
+    import main
+
+    game = main.SudokuGame()
+    game.pool.stop()
+    game.generator = PuzzleGenerator(random.Random(seed))
+    try:
+        game.playing = True
+        game.difficulty = DIFFICULTIES[0]
+        game.board, game.correct_board = game.generate_board(game.difficulty)
+        game.fill_buttons()
+        game.current_time = 0
+        game.change_highlighting((4, 4))
+        game.draw_game_window()
+
+        results['render/draw_game_window'] = summarize(measure(game.draw_game_window, repeat))
+
+        rng = random.Random(seed)
+        cells = [(rng.randrange(grid.BOARD_SIZE), rng.randrange(grid.BOARD_SIZE)) for i in range(repeat)]
+        cells = iter(cells)
+        results['render/change_highlighting'] = summarize(measure(lambda: game.change_highlighting(next(cells)), repeat))
+    finally:
+        pygame.quit()
+
+
+def bench_startup(results, repeat, seed):
+    samples = []
+    for i in range(repeat):
+        result = subprocess.run([sys.executable, '-c', STARTUP_SCRIPT], capture_output=True, text=True, check=True)
+        samples.append(float(result.stdout.split()[-1]))
+    results['startup/first_frame'] = summarize(samples)
+
+
+def over_budget(report, budget):
+    stats = report['results'].get('startup/first_frame')
+    if budget is None or stats is None or stats['p50_ms'] <= budget:
+        return False
+    print(f'time to first frame {stats["p50_ms"]:.1f} ms is over the {budget:g} ms budget', file=sys.stderr)
+    return True
+
+
+def run(sections, repeat, seed):
+    results = {}
+    benches = {
+        'solve': bench_solve,
+        'generate': bench_generate,
+        'render': bench_render,
+        'startup': bench_startup
+    }
+    for section in sections:
+        random.seed(seed)
+        benches[section](results, repeat, seed)
+    return {
+        'meta': {
+            'seed': seed,
+            'repeat': repeat,
+            'python': platform.python_version(),
+            'platform': platform.platform()
+        },
+        'results': results
+    }
+
+
+def compare(report, baseline, tolerance):
+    regressions = []
+    for name, stats in sorted(report['results'].items()):
+        base = baseline['results'].get(name)
+        if base is None:
+            continue
+        ratio = stats['p50_ms'] / base['p50_ms'] if base['p50_ms'] else 1.0
+        slower = stats['p50_ms'] - base['p50_ms'] > MIN_DELTA_MS
+        flag = 'REGRESSION' if slower and ratio > 1 + tolerance else ''
+        print(f'{name:40} {base["p50_ms"]:10.3f} -> {stats["p50_ms"]:10.3f} ms  x{ratio:5.2f} {flag}', file=sys.stderr)
+        if flag:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the solver, generator, renderer and startup headlessly.')
+    parser.add_argument('-n', '--repeat', type=int, default=20, help='runs per benchmark')
+    parser.add_argument('-s', '--seed', type=int, default=1, help='RNG seed')
+    parser.add_argument('--only', action='append', choices=SECTIONS, help='run only this section (repeatable)')
+    parser.add_argument('-o', '--output', default=None, help='write the JSON report to this file')
+    parser.add_argument('-b', '--baseline', default=None, help='compare p50 timings against this JSON report')
+    parser.add_argument('-t', '--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='allowed p50 slowdown before a benchmark counts as a regression')
+    parser.add_argument('--startup-budget', type=float, default=None, metavar='MS',
+                        help=f'fail when the p50 time to first frame is over MS (the target is {STARTUP_BUDGET_MS})')
+    args = parser.parse_args(argv)
+
+    output = os.path.abspath(args.output) if args.output else None
+    baseline_path = os.path.abspath(args.baseline) if args.baseline else None
+    # the game loads its images and save files relative to the repository
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    report = run(args.only or SECTIONS, args.repeat, args.seed)
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if output:
+        with open(output, 'w') as file:
+            file.write(text + '\n')
+    else:
+        print(text)
+
+    status = 1 if over_budget(report, args.startup_budget) else 0
+    if baseline_path:
+        with open(baseline_path) as file:
+            baseline = json.load(file)
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            print(f'{len(regressions)} benchmark(s) regressed: {", ".join(regressions)}', file=sys.stderr)
+            return 1
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,104 @@
+import grid
+
+
+class Board:
+
+    __slots__ = ('cells', 'geometry', 'size', 'empty', 'counts', 'rows', 'cols', 'boxes')
+
+    def __init__(self, cells=None, geometry=None):
+        if geometry is None:
+            geometry = grid.STANDARD if cells is None else grid.geometry_for(len(cells))
+        self.geometry = geometry
+        self.size = geometry.size
+        self.cells = bytearray(geometry.cells) if cells is None else bytearray(cells)
+        if len(self.cells) != geometry.cells:
+            raise ValueError(f'Board needs {geometry.cells} cells, got {len(self.cells)}')
+        self.recount()
+
+    @classmethod
+    def from_rows(cls, rows):
+        return cls(grid.flatten(rows))
+
+    def to_rows(self):
+        return grid.unflatten(self.cells)
+
+    def recount(self):
+        g = self.geometry
+        self.empty = 0
+        self.counts = [0] * (g.size + 1)
+        self.rows = [0] * g.size
+        self.cols = [0] * g.size
+        self.boxes = [0] * g.size
+        for i, value in enumerate(self.cells):
+            if value > g.size:
+                raise ValueError(f'Cell value {value} out of range')
+            self.counts[value] += 1
+            if value:
+                bit = 1 << value
+                self.rows[g.row[i]] |= bit
+                self.cols[g.col[i]] |= bit
+                self.boxes[g.box[i]] |= bit
+        self.empty = self.counts[0]
+
+    def load(self, cells):
+        self.cells[:] = bytes(cells)
+        self.recount()
+
+    def copy(self):
+        board = Board.__new__(Board)
+        board.cells = self.cells[:]
+        board.geometry = self.geometry
+        board.size = self.size
+        board.empty = self.empty
+        board.counts = self.counts[:]
+        board.rows = self.rows[:]
+        board.cols = self.cols[:]
+        board.boxes = self.boxes[:]
+        return board
+
+    def __getitem__(self, pos):
+        return self.cells[pos[0] * self.size + pos[1]]
+
+    def __setitem__(self, pos, value):
+        row, col = pos
+        i = row * self.size + col
+        old = self.cells[i]
+        if old == value:
+            return
+        box = self.geometry.box[i]
+        if old:
+            bit = ~(1 << old)
+            self.rows[row] &= bit
+            self.cols[col] &= bit
+            self.boxes[box] &= bit
+        if value:
+            bit = 1 << value
+            self.rows[row] |= bit
+            self.cols[col] |= bit
+            self.boxes[box] |= bit
+        self.counts[old] -= 1
+        self.counts[value] += 1
+        self.empty = self.counts[0]
+        self.cells[i] = value
+
+    def __eq__(self, other):
+        return isinstance(other, Board) and self.cells == other.cells
+
+    def __repr__(self):
+        return f'Board({grid.to_line(self)!r})'
+
+    def is_complete(self):
+        return not self.empty
+
+    def find_next(self):
+        i = self.cells.find(0)
+        if i < 0:
+            return None
+        return divmod(i, self.size)
+
+    def candidates(self, row, col):
+        box = self.geometry.box[row * self.size + col]
+        return self.geometry.all & ~(self.rows[row] | self.cols[col] | self.boxes[box])
+
+    def is_valid(self, value, row, col):
+        return bool(self.candidates(row, col) & (1 << value))
@@ -0,0 +1,94 @@
+NAKED_SINGLE = 'naked single'
+HIDDEN_SINGLE = 'hidden single'
+
+
+class CandidateModel:
+
+    # candidate masks of a board in play, kept current one move at a time: a move only
+    # touches the cell and its peers, so updates and hints cost O(peers) whatever the board holds
+
+    def __init__(self, board):
+        self.reset(board)
+
+    def reset(self, board):
+        g = board.geometry
+        self.board = board
+        self.geometry = g
+        self.stride = g.size + 1
+        self.cand = cand = [self.cell_candidates(i) for i in range(g.cells)]
+        # the cell values the masks were last brought up to date with
+        self.values = bytearray(board.cells)
+        # places[u * stride + d]: empty cells of unit u that can still take digit d
+        self.places = places = [0] * (len(g.units) * self.stride)
+        for u, unit in enumerate(g.units):
+            base = u * self.stride
+            for i in unit:
+                bits = cand[i]
+                while bits:
+                    bit = bits & -bits
+                    bits ^= bit
+                    places[base + g.digit[bit]] += 1
+        # cells with a single candidate and (unit, digit) pairs with a single place left
+        self.naked = {i for i, mask in enumerate(cand) if g.popcount[mask] == 1}
+        self.hidden = {divmod(key, self.stride) for key, count in enumerate(places) if count == 1}
+
+    def cell_candidates(self, i):
+        if self.board.cells[i]:
+            return 0
+        g = self.geometry
+        return self.board.candidates(g.row[i], g.col[i])
+
+    def refresh(self, i):
+        # brings the mask of i in line with the board, returns True if it changed
+        g = self.geometry
+        old = self.cand[i]
+        new = self.cell_candidates(i)
+        if old == new:
+            return False
+        self.cand[i] = new
+        if g.popcount[new] == 1:
+            self.naked.add(i)
+        else:
+            self.naked.discard(i)
+        for bits, delta in ((old & ~new, -1), (new & ~old, 1)):
+            while bits:
+                bit = bits & -bits
+                bits ^= bit
+                digit = g.digit[bit]
+                for u in g.cell_units[i]:
+                    key = u * self.stride + digit
+                    count = self.places[key] + delta
+                    self.places[key] = count
+                    if count == 1:
+                        self.hidden.add((u, digit))
+                    else:
+                        self.hidden.discard((u, digit))
+        return True
+
+    def update(self, i):
+        # call after the board changed at i, returns the cells whose candidates changed
+        old = self.values[i]
+        value = self.values[i] = self.board.cells[i]
+        changed = [i] if self.refresh(i) else []
+        # filling an empty cell only takes its digit from the peers that still had it
+        placed = 1 << value if value else 0
+        for peer in self.geometry.peers[i]:
+            if (old or self.cand[peer] & placed) and self.refresh(peer):
+                changed.append(peer)
+        return changed
+
+    def marks(self, i):
+        return self.cand[i]
+
+    def hint(self):
+        # the next cell that follows from the position by a single, as (cell, value, reason), or None
+        if self.naked:
+            i = min(self.naked)
+            return i, self.geometry.digit[self.cand[i]], NAKED_SINGLE
+        if self.hidden:
+            u, digit = min(self.hidden)
+            bit = 1 << digit
+            for i in self.geometry.units[u]:
+                if self.cand[i] & bit:
+                    return i, digit, HIDDEN_SINGLE
+        return None
@@ -0,0 +1,149 @@
+import hashlib
+from operator import itemgetter
+from itertools import permutations, product
+
+import grid
+
+KEY_SIZE = 16
+CACHE_SIZE = 1 << 16
+# every clue order inside a stack ties on the first row, 4! and 5! orders per stack add up to
+# seconds per 16x16 puzzle and far more on 25x25, so only 9x9 boards get a full canonical form
+BOX_SIZES = (3,)
+
+
+class Canonicalizer:
+
+    # the canonical form is the lexicographically smallest board reachable through band and stack
+    # permutations, row and column permutations inside them, transposition and digit relabelling,
+    # with digits relabelled by first appearance and empty cells sorting after every digit
+
+    def __init__(self, geometry=grid.STANDARD, cache_size=CACHE_SIZE):
+        self.geometry = geometry
+        self.box_size = geometry.box_size
+        self.size = geometry.size
+        self.blank = geometry.size + 1
+        self.bands = tuple(tuple(range(band * self.box_size, (band + 1) * self.box_size)) for band in range(self.box_size))
+        self.cache_size = cache_size
+        self.cache = {}
+        self.hits = 0
+        self.misses = 0
+
+    def views(self, cells):
+        size = self.size
+        rows = tuple(bytes(cells[i:i + size]) for i in range(0, len(cells), size))
+        return rows, tuple(bytes(col) for col in zip(*rows))
+
+    def stack_counts(self, row):
+        return tuple(sum(1 for col in stack if row[col]) for stack in self.bands)
+
+    def first_counts(self, row):
+        # the first row compares by its clue counts per stack, biggest first
+        return tuple(sorted(self.stack_counts(row), reverse=True))
+
+    def first_orders(self, row):
+        # column orders that make this row the smallest possible first row: stacks with more clues
+        # first, clues before empty cells inside each stack, any order among equals
+        counts = self.stack_counts(row)
+        groups = {}
+        for stack in sorted(range(self.box_size), key=lambda stack: -counts[stack]):
+            groups.setdefault(counts[stack], []).append(stack)
+        stack_orders = []
+        for stack in self.bands:
+            clues = [col for col in stack if row[col]]
+            blanks = [col for col in stack if not row[col]]
+            stack_orders.append([first + second for first in permutations(clues) for second in permutations(blanks)])
+        for arrangement in product(*(permutations(group) for group in groups.values())):
+            stacks = [stack for group in arrangement for stack in group]
+            for parts in product(*(stack_orders[stack] for stack in stacks)):
+                yield sum(parts, ())
+
+    def relabel(self, row, order, labels, count):
+        # order gathers the row in the current column order, labels translates digits to their labels
+        values = bytes(order(row))
+        if count < self.size:
+            copied = False
+            for value in values:
+                if value and not labels[value]:
+                    if not copied:
+                        labels = labels[:]
+                        copied = True
+                    count += 1
+                    labels[value] = count
+        return values.translate(labels), labels, count
+
+    def next_rows(self, used):
+        if len(used) % self.box_size:
+            band = self.bands[used[-1] // self.box_size]
+            return [row for row in band if row not in used]
+        taken = {row // self.box_size for row in used}
+        return [row for band, rows in enumerate(self.bands) if band not in taken for row in rows]
+
+    def canonical(self, cells):
+        if len(cells) != self.geometry.cells:
+            raise ValueError(f'Board needs {self.geometry.cells} cells, got {len(cells)}')
+        views = self.views(cells)
+        best = max(self.first_counts(row) for rows in views for row in rows)
+
+        # every transform that reaches the smallest prefix so far: rows, column order, rows used, labels
+        frontier = []
+        first = None
+        # translation table from digits to labels, 0 marks a digit without a label yet
+        empty = bytearray(256)
+        empty[0] = self.blank
+        for rows in views:
+            for r, row in enumerate(rows):
+                if self.first_counts(row) != best:
+                    continue
+                for order in self.first_orders(row):
+                    order = itemgetter(*order)
+                    key, labels, count = self.relabel(row, order, empty, 0)
+                    first = key
+                    frontier.append((rows, order, (r,), labels, count))
+        result = [first]
+
+        for level in range(1, self.size):
+            best = None
+            following = []
+            for rows, order, used, labels, count in frontier:
+                for r in self.next_rows(used):
+                    key, new_labels, new_count = self.relabel(rows[r], order, labels, count)
+                    if best is None or key < best:
+                        best = key
+                        following = []
+                    if key == best:
+                        following.append((rows, order, used + (r,), new_labels, new_count))
+            frontier = following
+            result.append(best)
+        return bytes(0 if value == self.blank else value for value in b''.join(result))
+
+    def canonical_hash(self, cells):
+        cells = bytes(cells)
+        key = self.cache.get(cells)
+        if key is not None:
+            self.hits += 1
+            return key
+        self.misses += 1
+        key = hashlib.blake2b(self.canonical(cells), digest_size=KEY_SIZE).digest()
+        if len(self.cache) >= self.cache_size:
+            del self.cache[next(iter(self.cache))]
+        self.cache[cells] = key
+        return key
+
+
+CANONICALIZERS = {}
+
+
+def canonicalizer(geometry=grid.STANDARD):
+    if geometry.box_size not in BOX_SIZES:
+        raise ValueError(f'No canonical form for box size {geometry.box_size}')
+    if geometry.box_size not in CANONICALIZERS:
+        CANONICALIZERS[geometry.box_size] = Canonicalizer(geometry)
+    return CANONICALIZERS[geometry.box_size]
+
+
+def canonical(cells):
+    return canonicalizer(grid.geometry_for(len(cells))).canonical(cells)
+
+
+def canonical_hash(cells):
+    return canonicalizer(grid.geometry_for(len(cells))).canonical_hash(cells)
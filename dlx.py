@@ -0,0 +1,179 @@
+import grid
+
+# search nodes expanded by solve() and count_solutions() since import
+nodes = 0
+
+# one pristine matrix per box size, copied by every DancingLinks instance
+MATRICES = {}
+
+
+def header(g):
+    # exact cover columns: one per cell, then row/digit, column/digit and box/digit pairs
+    return 4 * g.cells + 1
+
+
+def build_matrix(g):
+    cells, board_size = g.cells, g.size
+    header_size = header(g)
+    left = list(range(-1, header_size - 1))
+    left[0] = header_size - 1
+    right = list(range(1, header_size + 1))
+    right[-1] = 0
+    up = list(range(header_size))
+    down = list(range(header_size))
+    column = list(range(header_size))
+    size = [0] * header_size
+    for i in range(cells):
+        for d in range(board_size):
+            first = len(left)
+            columns = (1 + i,
+                       1 + cells + g.row[i] * board_size + d,
+                       1 + 2 * cells + g.col[i] * board_size + d,
+                       1 + 3 * cells + g.box[i] * board_size + d)
+            for k, col in enumerate(columns):
+                node = first + k
+                left.append(first + (k - 1) % 4)
+                right.append(first + (k + 1) % 4)
+                up.append(up[col])
+                down.append(col)
+                down[up[col]] = node
+                up[col] = node
+                column.append(col)
+                size[col] += 1
+    return left, right, up, down, column, size
+
+
+def matrix(g):
+    if g.box_size not in MATRICES:
+        MATRICES[g.box_size] = build_matrix(g)
+    return MATRICES[g.box_size]
+
+
+def row_node(g, i, value):
+    return header(g) + (i * g.size + value - 1) * 4
+
+
+def node_choice(g, node):
+    row = (node - header(g)) // 4
+    return row // g.size, row % g.size + 1
+
+
+class DancingLinks:
+
+    def __init__(self, board):
+        self.cells = grid.flatten(board)
+        self.geometry = grid.geometry_for(len(self.cells))
+        self.left, self.right, self.up, self.down, self.column, self.size = (list(a) for a in matrix(self.geometry))
+        self.chosen = []
+        self.solution = None
+        self.nodes = 0
+        self.valid = True
+        covered = set()
+        for i, value in enumerate(self.cells):
+            if not value:
+                continue
+            node = row_node(self.geometry, i, value)
+            j = node
+            while True:
+                col = self.column[j]
+                if col in covered:
+                    self.valid = False
+                    return
+                covered.add(col)
+                self.cover(col)
+                j = self.right[j]
+                if j == node:
+                    break
+
+    def cover(self, col):
+        left, right, up, down, column, size = self.left, self.right, self.up, self.down, self.column, self.size
+        left[right[col]] = left[col]
+        right[left[col]] = right[col]
+        i = down[col]
+        while i != col:
+            j = right[i]
+            while j != i:
+                up[down[j]] = up[j]
+                down[up[j]] = down[j]
+                size[column[j]] -= 1
+                j = right[j]
+            i = down[i]
+
+    def uncover(self, col):
+        left, right, up, down, column, size = self.left, self.right, self.up, self.down, self.column, self.size
+        i = up[col]
+        while i != col:
+            j = left[i]
+            while j != i:
+                size[column[j]] += 1
+                up[down[j]] = j
+                down[up[j]] = j
+                j = left[j]
+            i = up[i]
+        left[right[col]] = col
+        right[left[col]] = col
+
+    def search(self, limit):
+        right, down, size = self.right, self.down, self.size
+        col = right[0]
+        if col == 0:
+            if self.solution is None:
+                self.solution = list(self.cells)
+                for node in self.chosen:
+                    i, value = node_choice(self.geometry, node)
+                    self.solution[i] = value
+            return 1
+
+        best = col
+        while col:
+            if size[col] < size[best]:
+                best = col
+                if size[col] < 2:
+                    break
+            col = right[col]
+        if not size[best]:
+            return 0
+
+        found = 0
+        self.cover(best)
+        node = down[best]
+        while node != best and found < limit:
+            self.nodes += 1
+            self.chosen.append(node)
+            j = right[node]
+            while j != node:
+                self.cover(self.column[j])
+                j = right[j]
+            found += self.search(limit - found)
+            j = self.left[node]
+            while j != node:
+                self.uncover(self.column[j])
+                j = self.left[j]
+            self.chosen.pop()
+            node = down[node]
+        self.uncover(best)
+        return found
+
+    def count(self, limit):
+        if not self.valid:
+            return 0
+        return self.search(limit)
+
+
+def solve(board):
+    global nodes
+    solver = DancingLinks(board)
+    found = solver.count(1)
+    nodes += solver.nodes
+    if not found:
+        return False
+    grid.fill(board, solver.solution)
+    return True
+
+
+def count_solutions(board, limit=2):
+    global nodes
+    solver = DancingLinks(board)
+    found = solver.count(limit)
+    nodes += solver.nodes
+    return found
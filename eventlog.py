@@ -0,0 +1,130 @@
+import struct
+from collections import namedtuple
+
+import grid
+from board import Board
+from grid import DIFFICULTIES
+from storage import SavedGame, pack_cells, packed_size, unpack_cells
+
+MAGIC = b'SDKR'
+VERSION = 1
+
+# record kinds, the first byte of every record
+GAME = 1
+SELECT = 2
+DIGIT = 3
+SOLVE = 4
+END = 5
+WAIT = 6
+
+# how a session ended, the value of its END record
+EXITED = 0
+VICTORY = 1
+LOSS = 2
+
+HEADER = struct.Struct('<4sB')
+# kind, box size, difficulty, mistakes, solving flag, elapsed seconds, then the packed board and solution
+GAME_RECORD = struct.Struct('<BBBBBI')
+# kind, milliseconds of game clock since the previous record, cell index or value
+EVENT = struct.Struct('<BHH')
+MAX_DELTA = 0xFFFF
+FLUSH_SIZE = 4096
+
+Session = namedtuple('Session', 'game events outcome')
+
+
+class EventLog:
+
+    # append-only session recorder, records collect in memory and reach the file a batch at a time
+
+    def __init__(self, path, flush_size=FLUSH_SIZE):
+        self.file = open(path, 'ab')
+        if self.file.tell() == 0:
+            self.file.write(HEADER.pack(MAGIC, VERSION))
+        else:
+            with open(path, 'rb') as file:
+                if file.read(HEADER.size) != HEADER.pack(MAGIC, VERSION):
+                    self.file.close()
+                    raise ValueError(f'{path} is not an event log of this version')
+        self.flush_size = flush_size
+        self.buffer = bytearray()
+        self.clock = 0
+
+    def game(self, board, solution, difficulty, seconds, mistakes, solving):
+        geometry = board.geometry
+        self.buffer += GAME_RECORD.pack(GAME, geometry.box_size, DIFFICULTIES.index(difficulty), mistakes, solving, seconds)
+        self.buffer += pack_cells(board.cells, geometry) + pack_cells(solution.cells, geometry)
+        self.clock = seconds * 1000
+
+    def event(self, kind, clock, value=0):
+        # clock is the game clock in milliseconds, long pauses take extra WAIT records
+        delta = max(0, clock - self.clock)
+        self.clock = max(self.clock, clock)
+        while delta > MAX_DELTA:
+            self.buffer += EVENT.pack(WAIT, MAX_DELTA, 0)
+            delta -= MAX_DELTA
+        self.buffer += EVENT.pack(kind, delta, value)
+        if kind == END or len(self.buffer) >= self.flush_size:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            self.file.write(self.buffer)
+            self.file.flush()
+            self.buffer.clear()
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+
+def read_game(data, offset):
+    # the saved game state a GAME record holds, and the offset past it, or None if the log ends inside it
+    _, box_size, difficulty, mistakes, solving, seconds = GAME_RECORD.unpack_from(data, offset)
+    if box_size not in grid.BOX_SIZES or difficulty >= len(DIFFICULTIES):
+        raise ValueError(f'Corrupt game record at byte {offset}')
+    geometry = grid.geometry(box_size)
+    size = packed_size(geometry)
+    start = offset + GAME_RECORD.size
+    end = start + 2 * size
+    if end > len(data):
+        return None, end
+    board = Board(unpack_cells(data[start:start + size], geometry), geometry)
+    solution = Board(unpack_cells(data[start + size:end], geometry), geometry)
+    return SavedGame(board, solution, DIFFICULTIES[difficulty], seconds, mistakes, bool(solving)), end
+
+
+def read_sessions(path):
+    # yields every recorded session in order, one cut short by a crash has outcome None
+    with open(path, 'rb') as file:
+        data = file.read()
+    if data[:HEADER.size] != HEADER.pack(MAGIC, VERSION):
+        raise ValueError(f'{path} is not an event log of this version')
+    offset = HEADER.size
+    session = None
+    clock = 0
+    while offset < len(data):
+        if data[offset] == GAME:
+            if offset + GAME_RECORD.size > len(data):
+                break
+            game, offset = read_game(data, offset)
+            if game is None:
+                break
+            if session is not None:
+                yield Session(*session)
+            session = [game, [], None]
+            clock = game.seconds * 1000
+            continue
+        if offset + EVENT.size > len(data):
+            break
+        kind, delta, value = EVENT.unpack_from(data, offset)
+        if session is None or not SELECT <= kind <= WAIT:
+            raise ValueError(f'Corrupt record at byte {offset}')
+        offset += EVENT.size
+        clock += delta
+        if kind == END:
+            session[2] = value
+        elif kind != WAIT:
+            session[1].append((kind, clock, value))
+    if session is not None:
+        yield Session(*session)
@@ -0,0 +1,243 @@
+import os
+import sys
+import time
+import random
+import argparse
+from itertools import count
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import grid
+import solver
+import rating
+import seedbank
+from board import Board
+from grid import DIFFICULTIES, DIFFICULTY_CELLS
+
+# accepted range of rating.TECHNIQUES levels for the hardest step a puzzle needs
+DIFFICULTY_RATING = {
+    'Easy': (0, 1),
+    'Medium': (2, 5),
+    'Hard': (6, rating.GUESS)
+}
+# attempts a puzzle the player is already waiting for gets before the closest rating will do
+RATING_ATTEMPTS = 20
+# search nodes a uniqueness check may spend per removal on boards bigger than 9x9,
+# a check that runs out keeps its clue
+CHECK_NODES = 8
+
+CHUNK_SIZE = 250
+
+
+class PuzzleGenerator:
+
+    def __init__(self, rng=None, box_size=grid.BOX_SIZE, count_nodes=None):
+        self.random = rng if rng is not None else random.Random()
+        self.geometry = grid.geometry(box_size)
+        self.rating = None
+        # called with the search nodes each puzzle's uniqueness checks spent
+        self.count_nodes = count_nodes
+        # solutions are dealt from the seed bank, the transforms below only serve sizes without one
+        self.bank = seedbank.bank(self.geometry)
+
+        self.func = {
+            0: self.transpose,
+            1: self.swap_rows_in_area,
+            2: self.swap_cols_in_area,
+            3: self.swap_horizontal_areas,
+            4: self.swap_vertical_areas
+        }
+
+    def generate(self, difficulty, attempts=None):
+        # without an attempt limit candidates keep coming until one rates inside the band
+        if self.geometry is not grid.STANDARD:
+            # the technique ladder is tuned for 9x9 and too slow on big boards, bands come from clues alone
+            self.rating = None
+            return self.generate_candidate(difficulty)
+        low, high = DIFFICULTY_RATING[difficulty]
+        best = None
+        for attempt in count() if attempts is None else range(attempts):
+            board, correct_board = self.generate_candidate(difficulty)
+            puzzle_rating = rating.rate(board)
+            if low <= puzzle_rating.level <= high:
+                self.rating = puzzle_rating
+                return board, correct_board
+            distance = max(low - puzzle_rating.level, puzzle_rating.level - high)
+            if best is None or distance < best[0]:
+                best = (distance, puzzle_rating, board, correct_board)
+        # nothing landed in the band, settle for the closest candidate
+        self.rating = best[1]
+        return best[2], best[3]
+
+    def generate_candidate(self, difficulty):
+        if self.bank is not None:
+            correct_board = self.bank.deal(self.random)
+        else:
+            temp_board = []
+            self.initialize(temp_board)
+            for i in range(35 * self.geometry.box_size // grid.BOX_SIZE):
+                self.func[self.random.randint(0, 4)](temp_board)
+            correct_board = Board.from_rows(temp_board)
+
+        low, high = DIFFICULTY_CELLS[self.geometry.box_size][difficulty]
+        clues = self.random.randint(low, high)
+        return self.remove_cells(correct_board, clues), correct_board
+
+    def remove_cells(self, solution, clues):
+        # the checker keeps the bitmask state of the current puzzle, so each removal
+        # only has to search for a solution that differs in the removed cell
+        checker = solver.BitmaskSolver(solution)
+        max_nodes = None if self.geometry is grid.STANDARD else CHECK_NODES
+        order = list(range(self.geometry.cells))
+        self.random.shuffle(order)
+        remaining = self.geometry.cells
+        for i in order:
+            if remaining <= clues:
+                break
+            value = checker.clear(i)
+            if checker.has_other_solution(i, value, max_nodes):
+                checker.restore(i, value)
+            else:
+                remaining -= 1
+        if self.count_nodes is not None:
+            self.count_nodes(checker.nodes)
+        return Board(checker.cells, self.geometry)
+
+    def initialize(self, board):
+        box_size, size = self.geometry.box_size, self.geometry.size
+        for i in range(size):
+            board.append([])
+            for j in range(size):
+                if not i % box_size:
+                    board[i].append(i // box_size + 1 + j)
+                else:
+                    try:
+                        board[i].append(board[i - 1][j + box_size])
+                    except IndexError:
+                        board[i].append(board[i - 1][j + box_size - size])
+                if board[i][j] > size:
+                    board[i][j] -= size
+
+    def transpose(self, board):
+        board[:] = map(list, zip(*board))
+
+    def swap_rows_in_area(self, board):
+        first, second = self.find_random_lines()
+        for j in range(self.geometry.size):
+            board[first][j], board[second][j] = board[second][j], board[first][j]
+
+    def swap_cols_in_area(self, board):
+        first, second = self.find_random_lines()
+        for i in range(self.geometry.size):
+            board[i][first], board[i][second] = board[i][second], board[i][first]
+
+    def swap_horizontal_areas(self, board):
+        box_size = self.geometry.box_size
+        first, second = self.find_random_areas()
+        for i in range(box_size):
+            for j in range(self.geometry.size):
+                board[first * box_size + i][j], board[second * box_size + i][j] = board[second * box_size + i][j], board[first * box_size + i][j]
+
+    def swap_vertical_areas(self, board):
+        box_size = self.geometry.box_size
+        first, second = self.find_random_areas()
+        for i in range(self.geometry.size):
+            for j in range(box_size):
+                board[i][first * box_size + j], board[i][second * box_size + j] = board[i][second * box_size + j], board[i][first * box_size + j]
+
+    def find_random_areas(self):
+        last = self.geometry.box_size - 1
+        first = self.random.randint(0, last)
+        second = None
+        while second is None or second == first:
+            second = self.random.randint(0, last)
+        return (first, second)
+
+    def find_random_lines(self):
+        box_size = self.geometry.box_size
+        area = self.random.randint(0, box_size - 1)
+        first = self.random.randint(area * box_size, area * box_size + box_size - 1)
+        second = None
+        while second is None or second == first:
+            second = self.random.randint(area * box_size, area * box_size + box_size - 1)
+        return (first, second)
+
+
+def generate_chunk(difficulty, count, seed, box_size=grid.BOX_SIZE):
+    generator = PuzzleGenerator(random.Random(seed), box_size)
+    lines = []
+    for i in range(count):
+        board, correct_board = generator.generate(difficulty)
+        score = generator.rating.score if generator.rating else 0
+        lines.append(f'{grid.to_line(board)} {grid.to_line(correct_board)} {difficulty} {score}\n')
+    return lines
+
+
+def generate_bulk(output, difficulties, count, workers=None, seed=None, chunk_size=CHUNK_SIZE, box_size=grid.BOX_SIZE):
+    if seed is None:
+        seed = random.randrange(2 ** 32)
+    workers = workers or os.cpu_count() or 1
+    tasks = []
+    for difficulty in difficulties:
+        for start in range(0, count, chunk_size):
+            tasks.append((difficulty, min(chunk_size, count - start)))
+
+    done = 0
+    total = count * len(difficulties)
+    start_time = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = set()
+        for index, (difficulty, size) in enumerate(tasks):
+            # each chunk gets its own seed so results do not depend on scheduling
+            pending.add(executor.submit(generate_chunk, difficulty, size, seed + index, box_size))
+            if len(pending) >= 2 * workers:
+                done += write_completed(output, pending)
+                report(done, total, start_time)
+        while pending:
+            done += write_completed(output, pending)
+            report(done, total, start_time)
+
+    elapsed = time.perf_counter() - start_time
+    return done, elapsed
+
+
+def write_completed(output, pending):
+    finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+    written = 0
+    for future in finished:
+        pending.discard(future)
+        lines = future.result()
+        output.writelines(lines)
+        written += len(lines)
+    output.flush()
+    return written
+
+
+def report(done, total, start_time):
+    elapsed = time.perf_counter() - start_time
+    rate = done / elapsed if elapsed else 0
+    print(f'\r{done}/{total} puzzles, {rate:.0f} puzzles/s', end='', file=sys.stderr, flush=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Generate Sudoku puzzles in bulk.')
+    parser.add_argument('-n', '--count', type=int, default=1000, help='puzzles per difficulty')
+    parser.add_argument('-d', '--difficulty', action='append', choices=DIFFICULTIES,
+                        help='difficulty to generate (repeatable, default: all)')
+    parser.add_argument('-j', '--workers', type=int, default=None, help='worker processes (default: all cores)')
+    parser.add_argument('-s', '--seed', type=int, default=None, help='base seed for reproducible output')
+    parser.add_argument('-b', '--box-size', type=int, choices=grid.BOX_SIZES, default=grid.BOX_SIZE,
+                        help='box size, 4 makes 16x16 and 5 makes 25x25 puzzles (unrated)')
+    parser.add_argument('-o', '--output', default='puzzles.txt', help="output file, '-' for stdout")
+    args = parser.parse_args(argv)
+
+    difficulties = args.difficulty or DIFFICULTIES
+    if args.output == '-':
+        done, elapsed = generate_bulk(sys.stdout, difficulties, args.count, args.workers, args.seed, box_size=args.box_size)
+    else:
+        with open(args.output, 'a') as output:
+            done, elapsed = generate_bulk(output, difficulties, args.count, args.workers, args.seed, box_size=args.box_size)
+    print(f'\n{done} puzzles in {elapsed:.2f}s ({done / max(elapsed, 1e-9):.0f} puzzles/s)', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
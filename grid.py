@@ -0,0 +1,135 @@
+from math import isqrt
+
+BOX_SIZE = 3
+BOX_SIZES = (3, 4, 5)
+# cell symbols in value order, 16x16 and 25x25 boards continue with letters
+SYMBOLS = '123456789ABCDEFGHIJKLMNOP'
+
+DIFFICULTIES = ('Easy', 'Medium', 'Hard')
+# clue counts per box size, single-pass checked removal stalls at about 22-28 clues on 9x9 and at
+# about 40% and 46% of the cells on 16x16 and 25x25, so Hard removes all it can
+DIFFICULTY_CELLS = {
+    3: {'Easy': (30, 35), 'Medium': (25, 29), 'Hard': (0, 0)},
+    4: {'Easy': (150, 160), 'Medium': (118, 128), 'Hard': (0, 0)},
+    5: {'Easy': (400, 420), 'Medium': (330, 350), 'Hard': (0, 0)}
+}
+
+# wide enough for the candidate masks of a 16x16 board
+POPCOUNT_BITS = 17
+
+
+def popcount_table(bits):
+    # masks with the next bit set count one more than the table so far, much cheaper at import than counting each mask
+    table = [0]
+    for bit in range(bits):
+        table += [count + 1 for count in table]
+    return tuple(table)
+
+
+POPCOUNT = popcount_table(POPCOUNT_BITS)
+
+
+class WidePopcount:
+
+    # 25x25 candidate masks are too wide for a flat table, count them in two halves
+    def __getitem__(self, mask):
+        return POPCOUNT[mask & ((1 << POPCOUNT_BITS) - 1)] + POPCOUNT[mask >> POPCOUNT_BITS]
+
+
+class Geometry:
+
+    def __init__(self, box_size):
+        size = box_size * box_size
+        cells = size * size
+        self.box_size = box_size
+        self.size = size
+        self.cells = cells
+
+        self.row = tuple(i // size for i in range(cells))
+        self.col = tuple(i % size for i in range(cells))
+        self.box = tuple((self.row[i] // box_size) * box_size + self.col[i] // box_size for i in range(cells))
+
+        self.rows = tuple(tuple(i for i in range(cells) if self.row[i] == r) for r in range(size))
+        self.cols = tuple(tuple(i for i in range(cells) if self.col[i] == c) for c in range(size))
+        self.boxes = tuple(tuple(i for i in range(cells) if self.box[i] == b) for b in range(size))
+        self.units = self.rows + self.cols + self.boxes
+        # indexes into units of the row, column and box of each cell
+        self.cell_units = tuple((self.row[i], size + self.col[i], 2 * size + self.box[i]) for i in range(cells))
+
+        self.peers = tuple(tuple(sorted(set(self.rows[self.row[i]] + self.cols[self.col[i]] + self.boxes[self.box[i]]) - {i}))
+                           for i in range(cells))
+
+        # candidate masks use bit d for digit d
+        self.all = ((1 << size) - 1) << 1
+        self.digit = {1 << d: d for d in range(1, size + 1)}
+        self.popcount = POPCOUNT if self.all < len(POPCOUNT) else WidePopcount()
+
+
+GEOMETRIES = {}
+
+
+def geometry(box_size=BOX_SIZE):
+    if box_size not in GEOMETRIES:
+        if box_size not in BOX_SIZES:
+            raise ValueError(f'Unsupported box size {box_size}')
+        GEOMETRIES[box_size] = Geometry(box_size)
+    return GEOMETRIES[box_size]
+
+
+def geometry_for(cells):
+    box_size = isqrt(isqrt(cells))
+    if box_size ** 4 != cells:
+        raise ValueError(f'{cells} cells do not make a square board')
+    return geometry(box_size)
+
+
+STANDARD = geometry()
+
+BOARD_SIZE = STANDARD.size
+CELLS = STANDARD.cells
+
+ROW = STANDARD.row
+COL = STANDARD.col
+BOX = STANDARD.box
+
+ROWS = STANDARD.rows
+COLS = STANDARD.cols
+BOXES = STANDARD.boxes
+UNITS = STANDARD.units
+
+PEERS = STANDARD.peers
+
+
+def flatten(board):
+    cells = getattr(board, 'cells', None)
+    if cells is not None:
+        return list(cells)
+    return [value for row in board for value in row]
+
+
+def unflatten(cells):
+    size = isqrt(len(cells))
+    return [list(cells[i:i + size]) for i in range(0, len(cells), size)]
+
+
+def fill(board, cells):
+    if hasattr(board, 'load'):
+        board.load(cells)
+    else:
+        size = len(board)
+        for row in range(size):
+            board[row][:] = cells[row * size:(row + 1) * size]
+
+
+def to_line(board):
+    return ''.join(SYMBOLS[value - 1] if value else '0' for value in flatten(board))
+
+
+def from_line(line):
+    fields = line.split()
+    line = fields[0] if fields else ''
+    size = geometry_for(len(line)).size
+    cells = [SYMBOLS.find(char.upper()) + 1 for char in line]
+    if max(cells) > size:
+        raise ValueError(f'Symbol out of range for a {size}x{size} board')
+    return unflatten(cells)
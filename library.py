@@ -0,0 +1,257 @@
+import os
+import sys
+import mmap
+import random
+import shutil
+import struct
+import hashlib
+import argparse
+import tempfile
+
+import grid
+import solver
+import canonical
+import storage
+import generator
+from board import Board
+from grid import DIFFICULTIES
+
+MAGIC = b'SDKL'
+VERSION = 2
+
+# magic, version, box size, difficulty count
+HEADER = struct.Struct('<4sBBH')
+# first record and record count of one difficulty, records of a difficulty are contiguous
+INDEX = struct.Struct('<II')
+SCORE = struct.Struct('<I')
+
+
+def record_size(geometry):
+    return 2 * storage.packed_size(geometry) + SCORE.size + canonical.KEY_SIZE
+
+
+def pack_record(board, solution, score, key, geometry):
+    return storage.pack_cells(board, geometry) + storage.pack_cells(solution, geometry) + SCORE.pack(score) + key
+
+
+def canonical_key(cells, geometry):
+    if geometry.box_size in canonical.BOX_SIZES:
+        return canonical.canonicalizer(geometry).canonical_hash(cells)
+    # without a canonical form only puzzles that differ by their digits alone collide
+    labels = {0: 0}
+    for value in cells:
+        if value not in labels:
+            labels[value] = len(labels)
+    return hashlib.blake2b(bytes(labels[value] for value in cells), digest_size=canonical.KEY_SIZE).digest()
+
+
+class Library:
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'rb')
+        try:
+            self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self.file.close()
+            raise ValueError('Empty library file')
+        self.view = memoryview(self.data)
+        try:
+            self.read_index()
+        except struct.error:
+            self.close()
+            raise ValueError('Truncated library file')
+        except ValueError:
+            self.close()
+            raise
+
+    def read_index(self):
+        magic, version, box_size, difficulties = HEADER.unpack_from(self.view)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('Not a puzzle library of this version')
+        if box_size not in grid.BOX_SIZES or difficulties != len(DIFFICULTIES):
+            raise ValueError('Corrupt library header')
+        self.geometry = grid.geometry(box_size)
+        self.cells_size = storage.packed_size(self.geometry)
+        self.record_size = record_size(self.geometry)
+        self.start = HEADER.size + difficulties * INDEX.size
+        self.index = {}
+        total = 0
+        for i, difficulty in enumerate(DIFFICULTIES):
+            first, count = INDEX.unpack_from(self.view, HEADER.size + i * INDEX.size)
+            if first != total:
+                raise ValueError('Corrupt library index')
+            self.index[difficulty] = (first, count)
+            total += count
+        if len(self.data) != self.start + total * self.record_size:
+            raise ValueError('Library size does not match its index')
+        self.total = total
+
+    def close(self):
+        self.view.release()
+        self.data.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def __len__(self):
+        return self.total
+
+    def count(self, difficulty):
+        return self.index[difficulty][1]
+
+    def record(self, difficulty, index):
+        # a view straight into the mapping, valid until the library is closed
+        first, count = self.index[difficulty]
+        if not 0 <= index < count:
+            raise IndexError('Record index out of range')
+        offset = self.start + (first + index) * self.record_size
+        return self.view[offset:offset + self.record_size]
+
+    def records(self, difficulty):
+        for index in range(self.count(difficulty)):
+            yield self.record(difficulty, index)
+
+    def random_record(self, difficulty, rng=random):
+        return self.record(difficulty, rng.randrange(self.count(difficulty)))
+
+    def decode(self, record):
+        size = self.cells_size
+        board = Board(storage.unpack_cells(record[:size], self.geometry), self.geometry)
+        solution = Board(storage.unpack_cells(record[size:2 * size], self.geometry), self.geometry)
+        score, = SCORE.unpack_from(record, 2 * size)
+        return board, solution, score
+
+    def random_puzzle(self, difficulty, rng=random):
+        record = self.random_record(difficulty, rng)
+        try:
+            board, solution, score = self.decode(record)
+        finally:
+            record.release()
+        return board, solution
+
+
+def read_lines(lines, geometry):
+    # generator.py output: puzzle, solution, difficulty and score per line
+    for line in lines:
+        fields = line.split()
+        if not fields:
+            continue
+        if len(fields) != 4 or fields[2] not in DIFFICULTIES:
+            raise ValueError(f'Malformed puzzle line {line!r}')
+        board, solution = Board.from_rows(grid.from_line(fields[0])), Board.from_rows(grid.from_line(fields[1]))
+        if board.geometry is not geometry or solution.geometry is not geometry:
+            raise ValueError(f'Puzzle is not {geometry.size}x{geometry.size}')
+        # canonical forms are only cheap for proper puzzles, a sparse board ties nearly every row ordering
+        checker = solver.BitmaskSolver(board)
+        if checker.count(2) != 1:
+            raise ValueError(f'Puzzle {fields[0]} does not have exactly one solution')
+        if bytes(checker.solution) != bytes(solution.cells):
+            raise ValueError(f'Solution {fields[1]} does not solve puzzle {fields[0]}')
+        yield board, solution, fields[2], int(fields[3])
+
+
+def build(path, lines, box_size=grid.BOX_SIZE):
+    # appends the puzzles from lines to the library at path and rewrites its index,
+    # only one record at a time is held in memory besides the set of canonical keys
+    existing = Library(path) if os.path.exists(path) else None
+    geometry = existing.geometry if existing is not None else grid.geometry(box_size)
+    keys = set()
+    added = dict.fromkeys(DIFFICULTIES, 0)
+    duplicates = 0
+    spools = {difficulty: tempfile.TemporaryFile() for difficulty in DIFFICULTIES}
+    try:
+        if existing is not None:
+            for difficulty in DIFFICULTIES:
+                for record in existing.records(difficulty):
+                    keys.add(bytes(record[-canonical.KEY_SIZE:]))
+                    record.release()
+
+        for board, solution, difficulty, score in read_lines(lines, geometry):
+            key = canonical_key(board.cells, geometry)
+            if key in keys:
+                duplicates += 1
+                continue
+            keys.add(key)
+            spools[difficulty].write(pack_record(board.cells, solution.cells, score, key, geometry))
+            added[difficulty] += 1
+
+        temp = path + '.tmp'
+        with open(temp, 'wb') as output:
+            output.write(HEADER.pack(MAGIC, VERSION, geometry.box_size, len(DIFFICULTIES)))
+            first = 0
+            for difficulty in DIFFICULTIES:
+                count = added[difficulty] + (existing.count(difficulty) if existing is not None else 0)
+                output.write(INDEX.pack(first, count))
+                first += count
+            for difficulty in DIFFICULTIES:
+                if existing is not None:
+                    start, count = existing.index[difficulty]
+                    offset = existing.start + start * existing.record_size
+                    output.write(existing.view[offset:offset + count * existing.record_size])
+                spools[difficulty].seek(0)
+                shutil.copyfileobj(spools[difficulty], output)
+            output.flush()
+            os.fsync(output.fileno())
+    finally:
+        for spool in spools.values():
+            spool.close()
+        if existing is not None:
+            existing.close()
+    os.replace(temp, path)
+    return added, duplicates
+
+
+def report(path):
+    with Library(path) as library:
+        size = library.geometry.size
+        print(f'{path}: {len(library)} {size}x{size} puzzles, {library.record_size} bytes each')
+        for difficulty in DIFFICULTIES:
+            print(f'  {difficulty}: {library.count(difficulty)}')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Build a memory-mapped Sudoku puzzle library.')
+    parser.add_argument('library', help='library file, created if missing')
+    parser.add_argument('-i', '--input', action='append', default=[],
+                        help="generator.py output to append, '-' for stdin (repeatable)")
+    parser.add_argument('-n', '--count', type=int, default=0, help='puzzles per difficulty to generate and append')
+    parser.add_argument('-j', '--workers', type=int, default=None, help='worker processes (default: all cores)')
+    parser.add_argument('-s', '--seed', type=int, default=None, help='base seed for reproducible output')
+    parser.add_argument('-b', '--box-size', type=int, choices=grid.BOX_SIZES, default=grid.BOX_SIZE,
+                        help='box size of a new library')
+    args = parser.parse_args(argv)
+
+    try:
+        if args.input or args.count:
+            with tempfile.TemporaryFile('w+') as generated:
+                if args.count:
+                    box_size = args.box_size
+                    if os.path.exists(args.library):
+                        with Library(args.library) as library:
+                            box_size = library.geometry.box_size
+                    generator.generate_bulk(generated, DIFFICULTIES, args.count, args.workers, args.seed, box_size=box_size)
+                    print(file=sys.stderr)
+                    generated.seek(0)
+                sources = [sys.stdin if name == '-' else open(name) for name in args.input]
+                try:
+                    lines = (line for source in sources + [generated] for line in source)
+                    added, duplicates = build(args.library, lines, args.box_size)
+                finally:
+                    for source in sources:
+                        if source is not sys.stdin:
+                            source.close()
+            print(f'added {sum(added.values())} puzzles, skipped {duplicates} duplicates', file=sys.stderr)
+        report(args.library)
+    except (OSError, ValueError) as error:
+        # missing or unreadable files, malformed input lines and foreign or corrupt libraries
+        parser.exit(2, f'{error}\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,21 +1,36 @@
-import os
-import pygame
-import random
 import time
-import pickle
-from copy import deepcopy
-from tkinter import Tk, messagebox
 
-WIDTH = 435
-HEIGHT = 595
-DISPLAY = (WIDTH, HEIGHT)
+# time to first frame is measured from here, before pygame and the game modules load
+STARTED = time.perf_counter()
+
+import os
+import argparse
+from functools import partial
+import pygame
+import storage
+import solver
+import dlx
+import eventlog
+from pool import PuzzlePool
+from generator import PuzzleGenerator, RATING_ATTEMPTS
+from assets import get_font, load_image, render_text
+import grid
+from grid import DIFFICULTIES
+from board import Board
+from candidates import CandidateModel
+from profiler import Profiler
 
 VERTICAL_OFFSET = 95
 HORIZONTAL_OFFSET = 15
 
 LINE_WIDTH = 2
 CELL_WIDTH = 45
-BOARD_SIZE = 9
+# cell size in pixels per box size, the window grows around the board
+CELL_WIDTHS = {
+    3: CELL_WIDTH,
+    4: 36,
+    5: 26
+}
 
 MENU_BG_COLOR = (255, 255, 255)
 GAME_BG_COLOR = (255, 255, 255)
@@ -39,24 +54,67 @@ DIGITS_COLOR = (0, 0, 0)
 CLICKED_COLOR = (152, 150, 255)
 OUTLINE_COLOR = (210, 210, 210)
 EQUAL_COLOR = (160, 160, 160)
+TRIAL_COLOR = (44, 41, 255)
+MARKS_COLOR = (120, 120, 120)
+GRID_LAYER_KEY = (255, 0, 255)
 DIGITS_FONT = 'candara'
 DIGITS_FONT_SIZE = 40
+MARKS_FONT_SIZE = 14
 ADDITIONAL_TEXT_FONT_SIZE = 20
 
 MAX_MISTAKES = 3
 
-DIFFICULTIES = ('Easy', 'Medium', 'Hard')
-DIFFICULTY_CELLS = {
-    'Easy': (30, 35),
-    'Medium': (25, 29),
-    'Hard': (20, 24)
+HINT_KEY = pygame.K_SPACE
+MARKS_KEY = pygame.K_TAB
+
+FPS = 60
+TICK_EVENT = pygame.USEREVENT
+TICK_INTERVAL = 250
+PROFILER_FONT_SIZE = 14
+
+SOLVERS = {
+    'bitmask': solver,
+    'dlx': dlx
+}
+SOLVER = 'bitmask'
+# search steps shown per frame, 'instant' fills the solution in at once
+SOLVE_SPEEDS = {
+    'slow': 1,
+    'normal': 8,
+    'fast': 64,
+    'instant': None
 }
+SOLVE_SPEED = 'normal'
+# seconds of solver work allowed per frame, whatever the speed
+SOLVE_FRAME_BUDGET = 0.008
+
+LOGO_PATH = 'img/sudoku_logo.png'
+ICON_PATH = 'icons/sudoku_icon.ico'
+
+# the withdrawn Tk root behind every end of game dialog, tkinter is only imported for the first one
+dialog_root = None
+
+
+def ask_yes_no(title, message):
+    global dialog_root
+    from tkinter import Tk, messagebox
+    if dialog_root is None:
+        dialog_root = Tk()
+        dialog_root.wm_withdraw()
+    return messagebox.askyesno(title, message, parent=dialog_root)
+
+
+def close_dialogs():
+    global dialog_root
+    if dialog_root is not None:
+        dialog_root.destroy()
+        dialog_root = None
 
 
 class Button:
 
     def __init__(self, x, y, width, height, color, outline=None, text='', text_color=DIGITS_COLOR,
-                 font=DIGITS_FONT, font_size=DIGITS_FONT_SIZE):
+                 font=DIGITS_FONT, font_size=DIGITS_FONT_SIZE, mark_size=0):
         self.x = x
         self.y = y
         self.width = width
@@ -67,6 +125,22 @@ class Button:
         self.text_color = text_color
         self.font = font
         self.font_size = font_size
+        # pencil marks as a candidate bitmask, drawn mark_size to a row when the cell is empty
+        self.marks = 0
+        self.mark_size = mark_size
+        self.mark_font_size = font_size * MARKS_FONT_SIZE // DIGITS_FONT_SIZE
+        self.drawn = None
+
+    def state(self):
+        return (self.x, self.y, self.width, self.height, self.color, self.outline, self.text, self.text_color, self.marks)
+
+    def is_dirty(self):
+        return self.drawn != self.state()
+
+    def get_rect(self):
+        if self.outline:
+            return pygame.Rect(self.x - 2, self.y - 2, self.width + 4, self.height + 4)
+        return pygame.Rect(self.x, self.y, self.width, self.height)
 
     def draw(self, win):
         if self.outline:
@@ -75,10 +149,21 @@ class Button:
         pygame.draw.rect(win, self.color, (self.x, self.y, self.width, self.height), 0)
 
         if self.text:
-            font = pygame.font.SysFont(self.font, self.font_size)
-            text = font.render(self.text, 1, self.text_color)
+            text = render_text(self.text, self.text_color, self.font, self.font_size)
             win.blit(text, (self.x + self.width // 2 - text.get_width() // 2,
                             self.y + self.height // 2 - text.get_height() // 2))
+        elif self.marks:
+            self.draw_marks(win)
+
+        self.drawn = self.state()
+
+    def draw_marks(self, win):
+        for value in range(1, self.mark_size * self.mark_size + 1):
+            if self.marks >> value & 1:
+                row, col = divmod(value - 1, self.mark_size)
+                text = render_text(grid.SYMBOLS[value - 1], MARKS_COLOR, self.font, self.mark_font_size)
+                win.blit(text, (self.x + (2 * col + 1) * self.width // (2 * self.mark_size) - text.get_width() // 2,
+                                self.y + (2 * row + 1) * self.height // (2 * self.mark_size) - text.get_height() // 2))
 
     def is_over(self, pos):
         if self.x <= pos[0] <= self.x + self.width:
@@ -90,320 +175,463 @@ class Button:
 
 class SudokuGame:
 
-    keys_dict = {
-        pygame.K_0: 0,
-        pygame.K_1: 1,
-        pygame.K_2: 2,
-        pygame.K_3: 3,
-        pygame.K_4: 4,
-        pygame.K_5: 5,
-        pygame.K_6: 6,
-        pygame.K_7: 7,
-        pygame.K_8: 8,
-        pygame.K_9: 9,
-    }
-
-    def __init__(self):
-        pygame.init()
-        self.window = pygame.display.set_mode(DISPLAY)
+    def __init__(self, backend=SOLVER, debug=False, profile_path=None, solve_speed=SOLVE_SPEED, box_size=grid.BOX_SIZE,
+                 library_path=None, record_path=None):
+        self.geometry = grid.geometry(box_size)
+        self.size = self.geometry.size
+        self.cell_width = CELL_WIDTHS[box_size]
+        self.width = self.size * self.cell_width + 2 * HORIZONTAL_OFFSET
+        self.height = self.size * self.cell_width + 2 * VERTICAL_OFFSET
+        self.hud_rect = pygame.Rect(0, 0, self.width, VERTICAL_OFFSET - LINE_WIDTH // 2)
+        # digits, then the letters of 16x16 and 25x25 boards
+        self.keys_dict = {pygame.K_0: 0}
+        for value, symbol in enumerate(grid.SYMBOLS[:self.size], 1):
+            self.keys_dict[getattr(pygame, 'K_' + symbol.lower())] = value
+        suffix = '' if box_size == grid.BOX_SIZE else f'_{self.size}x{self.size}'
+        self.save_path = f'last_game{suffix}.sav'
+        self.highscores_path = f'highscores{suffix}.sav'
+
+        # only what the game uses, pygame.init() would also bring up audio and joysticks
+        pygame.display.init()
+        pygame.font.init()
+        self.window = pygame.display.set_mode((self.width, self.height))
         pygame.display.set_caption('Sudoku')
 
-        self.logo = pygame.image.load('img/sudoku_logo.png')
-        self.icon = pygame.image.load('icons/sudoku_icon.ico')
+        self.logo = load_image(LOGO_PATH)
+        self.icon = load_image(ICON_PATH)
         pygame.display.set_icon(self.icon)
 
-        self.menu_title_font = pygame.font.SysFont(TITLE_FONT, 50)
+        self.menu_title_font = get_font(TITLE_FONT, 50)
         self.menu_title = self.menu_title_font.render("Sudoku Game", 1, TITLE_COLOR)
-        self.play_title_font = pygame.font.SysFont(TITLE_FONT, 40)
+        self.play_title_font = get_font(TITLE_FONT, 40)
         self.play_title = self.play_title_font.render("Sudoku Game", 1, TITLE_COLOR)
 
         self.playing = False
         self.solving = True
         self.choosing_diffculty = False
 
-        self.menu_buttons = [Button(WIDTH // 4, HEIGHT - (HEIGHT - HEIGHT // 2 - self.menu_title.get_height() // 2) // 2 - HORIZONTAL_OFFSET // 2 - HEIGHT // 8 + i * (HEIGHT // 8 + HORIZONTAL_OFFSET), WIDTH // 2,
-                                    HEIGHT // 8, MENU_BUTTON_COLOR, MENU_EXTRA_BUTTON_COLOR,
+        self.menu_buttons = [Button(self.width // 4, self.height - (self.height - self.height // 2 - self.menu_title.get_height() // 2) // 2 - HORIZONTAL_OFFSET // 2 - self.height // 8 + i * (self.height // 8 + HORIZONTAL_OFFSET), self.width // 2,
+                                    self.height // 8, MENU_BUTTON_COLOR, MENU_EXTRA_BUTTON_COLOR,
                                     MENU_BUTTON_TEXT[i], MENU_EXTRA_BUTTON_COLOR, DIGITS_FONT, 30)
                              for i in range(2)]
 
-        self.difficulty_buttons = [Button(WIDTH // 4, HEIGHT // 2 + self.menu_title.get_height() // 2 + i * HEIGHT // 9 + (i + 1) * HORIZONTAL_OFFSET,
-                                          WIDTH // 2, HEIGHT // 9, MENU_BUTTON_COLOR, MENU_EXTRA_BUTTON_COLOR,
+        self.difficulty_buttons = [Button(self.width // 4, self.height // 2 + self.menu_title.get_height() // 2 + i * self.height // 9 + (i + 1) * HORIZONTAL_OFFSET,
+                                          self.width // 2, self.height // 9, MENU_BUTTON_COLOR, MENU_EXTRA_BUTTON_COLOR,
                                           DIFFICULTIES[i], MENU_EXTRA_BUTTON_COLOR, DIGITS_FONT, 30)
                                    for i in range(3)]
 
-        self.board = [[0 for j in range(BOARD_SIZE)] for i in range(BOARD_SIZE)]
+        self.board = Board(geometry=self.geometry)
 
-        self.correct_board = [[0 for j in range(BOARD_SIZE)] for i in range(BOARD_SIZE)]
+        self.correct_board = Board(geometry=self.geometry)
+        self.candidates = CandidateModel(self.board)
+        self.show_marks = False
 
-        self.buttons_board = [[Button(HORIZONTAL_OFFSET + LINE_WIDTH + CELL_WIDTH * j,
-                                      VERTICAL_OFFSET + LINE_WIDTH + CELL_WIDTH * i,
-                                      CELL_WIDTH - LINE_WIDTH, CELL_WIDTH - LINE_WIDTH, GAME_BG_COLOR)
-                               for j in range(BOARD_SIZE)]
-                              for i in range(BOARD_SIZE)
+        self.buttons_board = [[Button(HORIZONTAL_OFFSET + LINE_WIDTH + self.cell_width * j,
+                                      VERTICAL_OFFSET + LINE_WIDTH + self.cell_width * i,
+                                      self.cell_width - LINE_WIDTH, self.cell_width - LINE_WIDTH, GAME_BG_COLOR,
+                                      font_size=DIGITS_FONT_SIZE * self.cell_width // CELL_WIDTH, mark_size=box_size)
+                               for j in range(self.size)]
+                              for i in range(self.size)
         ]
+        # the same buttons by cell index
+        self.cell_buttons = [button for row in self.buttons_board for button in row]
 
         self.solve_button = Button(HORIZONTAL_OFFSET,
-                                   HEIGHT - VERTICAL_OFFSET + HORIZONTAL_OFFSET,
+                                   self.height - VERTICAL_OFFSET + HORIZONTAL_OFFSET,
                                    CELL_WIDTH * 3 + LINE_WIDTH,
                                    VERTICAL_OFFSET - 2 * HORIZONTAL_OFFSET, CLICKED_COLOR,
                                    None, "Solve", GAME_BG_COLOR,
                                    DIGITS_FONT, ADDITIONAL_TEXT_FONT_SIZE
         )
 
-        self.exit_button = Button(WIDTH - HORIZONTAL_OFFSET - CELL_WIDTH * 3,
-                                  HEIGHT - VERTICAL_OFFSET + HORIZONTAL_OFFSET,
+        self.exit_button = Button(self.width - HORIZONTAL_OFFSET - CELL_WIDTH * 3,
+                                  self.height - VERTICAL_OFFSET + HORIZONTAL_OFFSET,
                                   CELL_WIDTH * 3 + LINE_WIDTH,
                                   VERTICAL_OFFSET - 2 * HORIZONTAL_OFFSET, CLICKED_COLOR,
                                   None, 'Exit', GAME_BG_COLOR,
                                   DIGITS_FONT, ADDITIONAL_TEXT_FONT_SIZE)
 
-        self.additional_text_font = pygame.font.SysFont(DIGITS_FONT, ADDITIONAL_TEXT_FONT_SIZE)
         self.clicked = (-1, -1)
+        self.highlighted = set()
+        self.digit_cells = {value: set() for value in range(1, self.size + 1)}
         self.mistakes = 0
         self.difficulty = None
         self.start_time = None
         self.current_time = None
+        self.clock_ms = 0
         self.highscores = self.get_highscores()
-
-        self.func = {
-            0: self.transpose,
-            1: self.swap_rows_in_area,
-            2: self.swap_cols_in_area,
-            3: self.swap_horizontal_areas,
-            4: self.swap_vertical_areas
-        }
+        self.clock = pygame.time.Clock()
+        self.screen = None
+        self.visible_buttons = []
+        self.hud = {}
+        self.layers = None
+        self.solver = SOLVERS[backend]
+        self.solve_speed = SOLVE_SPEEDS[solve_speed]
+        self.solve_steps = None
+
+        self.profiler = Profiler(debug, profile_path)
+        self.generator = PuzzleGenerator(box_size=box_size, count_nodes=partial(self.profiler.count, 'generator nodes'))
+        for name in ('solve', 'create_board', 'generate_board', 'generate_board_now', 'save_game', 'draw_game_window',
+                     'draw_menu_window', 'update_game_window', 'update_menu_window'):
+            self.profiler.wrap(self, name)
+        self.profiler.wrap(pygame.display, 'update', 'display.update')
+
+        self.library = None
+        if library_path:
+            # hashing and canonical forms come along with the library, most games never need them
+            import library
+            self.library = library.Library(library_path)
+        if self.library is not None and self.library.geometry is not self.geometry:
+            self.library.close()
+            raise ValueError(f'{library_path} does not hold {self.size}x{self.size} puzzles')
+        self.pool = PuzzlePool(self.generate_board, DIFFICULTIES, generate_now=self.generate_board_now)
+        # a library covering every difficulty makes background generation unnecessary
+        self.generate_ahead = self.library is None or not all(self.library.count(difficulty) for difficulty in DIFFICULTIES)
+        self.first_frame = None
+        self.log = eventlog.EventLog(record_path) if record_path else None
 
     def create_board(self, difficulty):
-        temp_board = []
-        self.initialize(temp_board)
-        for i in range(35):
-            self.func[random.randint(0, 4)](temp_board)
-        self.correct_board = deepcopy(temp_board)
-
-        open_cells = BOARD_SIZE * BOARD_SIZE - random.randint(DIFFICULTY_CELLS[difficulty][0],
-                                                              DIFFICULTY_CELLS[difficulty][1])
-        count = 0
-        while count < open_cells:
-            pos = (random.randint(0, BOARD_SIZE - 1), random.randint(0, BOARD_SIZE - 1))
-            if temp_board[pos[0]][pos[1]]:
-                temp_board[pos[0]][pos[1]] = 0
-                count += 1
-        if count == open_cells and self.solve(deepcopy(temp_board), False):
-            self.board = deepcopy(temp_board)
+        if self.library is not None and self.library.count(difficulty):
+            self.board, self.correct_board = self.library.random_puzzle(difficulty)
         else:
-            self.create_board()
-
-    def initialize(self, board):
-        for i in range(BOARD_SIZE):
-            board.append([])
-            for j in range(BOARD_SIZE):
-                if not i % 3:
-                    board[i].append(i // 3 + 1 + j)
-                else:
-                    try:
-                        board[i].append(board[i - 1][j + 3])
-                    except IndexError:
-                        board[i].append(board[i - 1][j - 6])
-                if board[i][j] > 9:
-                    board[i][j] -= 9
-
-    def transpose(self, board):
-        board = list(map(list, zip(*board)))
-
-    def swap_rows_in_area(self, board):
-        first, second = self.find_random_lines()
-        for j in range(BOARD_SIZE):
-            board[first][j], board[second][j] = board[second][j], board[first][j]
-
-    def swap_cols_in_area(self, board):
-        first, second = self.find_random_lines()
-        for i in range(BOARD_SIZE):
-            board[i][first], board[i][second] = board[i][second], board[i][first]
-
-    def swap_horizontal_areas(self, board):
-        first, second = self.find_random_areas()
-        for i in range(3):
-            for j in range(BOARD_SIZE):
-                board[first * 3 + i][j], board[second * 3 + i][j] = board[second * 3 + i][j], board[first * 3 + i][j]
-
-    def swap_vertical_areas(self, board):
-        first, second = self.find_random_areas()
-        for i in range(BOARD_SIZE):
-            for j in range(3):
-                board[i][first * 3 + j], board[i][second * 3 + j] = board[i][second * 3 + j], board[i][first * 3 + j]
-
-    def find_random_areas(self):
-        first = random.randint(0, 2)
-        second = None
-        while second is None or second == first:
-            second = random.randint(0, 2)
-        return (first, second)
-
-    def find_random_lines(self):
-        area = random.randint(0, 2)
-        first = random.randint(area * 3, area * 3 + 2)
-        second = None
-        while second is None or second == first:
-            second = random.randint(area * 3, area * 3 + 2)
-        return (first, second)
+            self.board, self.correct_board = self.pool.get(difficulty)
+
+    def generate_board(self, difficulty):
+        return self.generator.generate(difficulty)
+
+    def generate_board_now(self, difficulty):
+        # the player is waiting on an empty pool, a few attempts and the closest rating will do
+        return self.generator.generate(difficulty, RATING_ATTEMPTS)
 
     def save_game(self):
-        data = {
-            'difficulty': self.difficulty,
-            'time': self.format_time(self.current_time),
-            'mistakes': self.mistakes,
-            'board': self.board
-        }
-        with open('last_game.pickle', 'wb') as file:
-            pickle.dump(data, file)
+        storage.write_game(self.save_path, self.board, self.correct_board, self.difficulty,
+                           self.current_time, self.mistakes, self.solving)
 
     def solve(self, board=None, display=True):
         if display and board is None:
             board = self.board
-        pos = self.find_next(board)
-        if pos is None:
+        if not display:
+            return self.solver.solve(board)
+
+        if self.solve_speed is not None:
+            # animated: the main loop plays the search back a few steps per frame
+            self.solve_steps = solver.solve_steps(board)
             return True
-        else:
-            row, col = pos[0], pos[1]
-            for value in range(1, 10):
-                if self.isValid(board, value, row, col):
-                    board[row][col] = value
-                    if display:
-                        self.buttons_board[row][col].text = str(value)
-                        self.buttons_board[row][col].draw(self.window)
-                        # pygame.time.delay(20)
-                        pygame.display.update()
-                        if self.solve():
-                            return True
-                    else:
-                        if self.solve(board, False):
-                            return True
+        solution = board.copy()
+        if not self.solver.solve(solution):
+            return False
+        self.finish_solve(solution.cells)
+        return True
 
-                    board[row][col] = 0
+    def advance_solve(self):
+        deadline = time.perf_counter() + SOLVE_FRAME_BUDGET
+        for step in range(self.solve_speed):
+            try:
+                (row, col), value, action = next(self.solve_steps)
+            except StopIteration as stop:
+                self.solve_steps = None
+                self.finish_solve(stop.value)
+                return
+            self.profiler.count('animated solve steps')
+            button = self.buttons_board[row][col]
+            button.text = grid.SYMBOLS[value - 1] if value else ''
+            button.text_color = TRIAL_COLOR if action == 'try' else DIGITS_COLOR
+            if time.perf_counter() >= deadline:
+                break
+
+    def finish_solve(self, cells):
+        if cells is None:
+            self.fill_buttons()
+            return
+        for i, value in enumerate(cells):
+            row, col = divmod(i, self.size)
+            if not self.board[row, col]:
+                self.set_cell(row, col, value)
+                self.buttons_board[row][col].text_color = DIGITS_COLOR
+
+    def stop_solve(self):
+        if self.solve_steps is not None:
+            self.solve_steps.close()
+            self.solve_steps = None
+            self.fill_buttons()
 
-        return False
+    def count_solutions(self, board, limit=2):
+        return self.solver.count_solutions(board, limit)
 
     def find_next(self, board):
-        for i in range(BOARD_SIZE):
-            for j in range(BOARD_SIZE):
-                if board[i][j] == 0:
-                    return (i, j)
-        return None
+        return board.find_next()
 
     def isValid(self, board, value, row, col):
-        for i in range(BOARD_SIZE):
-            if board[row][i] == value or board[i][col] == value:
-                return False
-
-        left_border = 3 * (row // 3)
-        up_border = 3 * (col // 3)
-        for i in range(left_border, left_border + 3):
-            for j in range(up_border, up_border + 3):
-                if board[i][j] == value:
-                    return False
-        return True
+        return board.is_valid(value, row, col)
+
+    def cell_at(self, pos):
+        col, x = divmod(pos[0] - HORIZONTAL_OFFSET - LINE_WIDTH, self.cell_width)
+        row, y = divmod(pos[1] - VERTICAL_OFFSET - LINE_WIDTH, self.cell_width)
+        if 0 <= row < self.size and 0 <= col < self.size and x <= self.cell_width - LINE_WIDTH and y <= self.cell_width - LINE_WIDTH:
+            return (row, col)
+        return None
+
+    def cell_button(self, i):
+        return self.cell_buttons[i]
+
+    def set_cell(self, row, col, value):
+        old = self.board[row, col]
+        if old:
+            self.digit_cells[old].discard(row * self.size + col)
+        if value:
+            self.digit_cells[value].add(row * self.size + col)
+        self.board[row, col] = value
+        self.buttons_board[row][col].text = grid.SYMBOLS[value - 1] if value else ''
+        # only the cell and its peers can change candidates
+        for i in self.candidates.update(row * self.size + col):
+            if self.show_marks:
+                self.cell_button(i).marks = self.candidates.marks(i)
+
+    def toggle_marks(self):
+        self.show_marks = not self.show_marks
+        self.update_marks()
+
+    def update_marks(self):
+        for i in range(self.geometry.cells):
+            self.cell_button(i).marks = self.candidates.marks(i) if self.show_marks else 0
+
+    def show_hint(self):
+        hint = self.candidates.hint()
+        if hint is not None:
+            self.select(divmod(hint[0], self.size))
+        return hint
+
+    def select(self, cell):
+        # a cell picked by the player, by mouse, arrow keys or hint
+        self.change_highlighting(cell)
+        self.record(eventlog.SELECT, cell[0] * self.size + cell[1])
+
+    def enter_value(self, value):
+        # the clicked cell takes value if it is right, otherwise it is a mistake; returns how the game ended, if it did
+        row, col = self.clicked
+        if value == self.correct_board[row, col]:
+            self.set_cell(row, col, value)
+            self.buttons_board[row][col].text_color = GUESSED_COLOR
+            if self.board.is_complete() and self.solving:
+                if self.highscores[self.difficulty] is None or self.current_time < self.highscores[self.difficulty]:
+                    self.highscores[self.difficulty] = self.current_time
+                    self.update_highscores()
+                return eventlog.VICTORY
+        elif not self.board[row, col]:
+            self.mistakes += 1
+            if self.mistakes == MAX_MISTAKES:
+                return eventlog.LOSS
+        return None
+
+    def tick_clock(self):
+        # the replay log and the highscores read the same clock
+        self.clock_ms = round((time.time() - self.start_time) * 1000)
+        self.current_time = round(self.clock_ms / 1000)
+
+    def record(self, kind, value=0):
+        if self.log is not None:
+            self.log.event(kind, self.clock_ms, value)
 
     def change_highlighting(self, pos=(-1, -1)):
-        if not self.clicked == (-1, -1):
-            for i in range(BOARD_SIZE):
-                for j in range(BOARD_SIZE):
-                    self.buttons_board[i][j].color = GAME_BG_COLOR
+        buttons = self.cell_buttons
+        for i in self.highlighted:
+            buttons[i].color = GAME_BG_COLOR
+        self.highlighted = set()
         self.clicked = (pos[0], pos[1])
         if not self.clicked == (-1, -1):
-            for i in range(BOARD_SIZE):
-                self.buttons_board[self.clicked[0]][i].color = OUTLINE_COLOR
-                self.buttons_board[i][self.clicked[1]].color = OUTLINE_COLOR
-            for i in range(3 * (self.clicked[0] // 3), 3 * (self.clicked[0] // 3) + 3):
-                for j in range(3 * (self.clicked[1] // 3), 3 * (self.clicked[1] // 3) + 3):
-                    self.buttons_board[i][j].color = OUTLINE_COLOR
-            if self.buttons_board[self.clicked[0]][self.clicked[1]].text:
-                for i in range(BOARD_SIZE):
-                    for j in range(BOARD_SIZE):
-                        if self.buttons_board[i][j].text == self.buttons_board[self.clicked[0]][self.clicked[1]].text:
-                            self.buttons_board[i][j].color = EQUAL_COLOR
+            index = self.clicked[0] * self.size + self.clicked[1]
+            for i in self.geometry.peers[index]:
+                buttons[i].color = OUTLINE_COLOR
+            self.highlighted.update(self.geometry.peers[index])
+            value = self.board[self.clicked]
+            if value:
+                for i in self.digit_cells[value]:
+                    buttons[i].color = EQUAL_COLOR
+                self.highlighted.update(self.digit_cells[value])
             self.buttons_board[self.clicked[0]][self.clicked[1]].color = CLICKED_COLOR
+            self.highlighted.add(index)
 
     def draw_menu_window(self):
-        self.window.fill(MENU_BG_COLOR)
-
-        self.window.blit(self.logo, (WIDTH // 2 - self.logo.get_width() // 2, HEIGHT // 9))
-
-        self.window.blit(self.menu_title, (WIDTH // 2 - self.menu_title.get_width() // 2,
-                                           HEIGHT // 2 - self.menu_title.get_height() // 2))
+        if self.layers != self.layers_key():
+            self.build_layers()
+        self.window.blit(self.menu_background, (0, 0))
 
         if self.choosing_diffculty:
-            for button in self.difficulty_buttons:
-                button.draw(self.window)
-            for difficulty, time in self.highscores.items():
-                for button in self.difficulty_buttons:
-                    if button.text == difficulty:
-                        if time is None:
-                            text = self.additional_text_font.render("No highscore yet", 1, EXTRA_LINES_COLOR)
-                        else:
-                            text = self.additional_text_font.render(self.format_time(time), 1, EXTRA_LINES_COLOR)
-                        self.window.blit(text, ((2 * button.x + button.width) // 2 - text.get_width() // 2, button.y + button.height * 2 // 3))
-
+            self.visible_buttons = self.difficulty_buttons
         else:
-            for button in self.menu_buttons:
-                if not (button.text == MENU_BUTTON_TEXT[0] and not self.isSaved()):
-                    button.draw(self.window)
+            self.visible_buttons = [button for button in self.menu_buttons
+                                    if not (button.text == MENU_BUTTON_TEXT[0] and not self.isSaved())]
+        for button in self.visible_buttons:
+            self.draw_menu_button(button)
 
         pygame.display.update()
 
+    def draw_menu_button(self, button):
+        button.draw(self.window)
+        if self.choosing_diffculty and button.text in self.highscores:
+            time = self.highscores[button.text]
+            if time is None:
+                text = render_text("No highscore yet", EXTRA_LINES_COLOR, DIGITS_FONT, ADDITIONAL_TEXT_FONT_SIZE)
+            else:
+                text = render_text(self.format_time(time), EXTRA_LINES_COLOR, DIGITS_FONT, ADDITIONAL_TEXT_FONT_SIZE)
+            self.window.blit(text, ((2 * button.x + button.width) // 2 - text.get_width() // 2, button.y + button.height * 2 // 3))
+
+    def update_menu_window(self):
+        rects = []
+        for button in self.visible_buttons:
+            if button.is_dirty():
+                self.draw_menu_button(button)
+                rects.append(button.get_rect())
+        return rects
+
     def draw_cells(self):
-        for i in range(BOARD_SIZE):
-            for j in range(BOARD_SIZE):
+        for i in range(self.size):
+            for j in range(self.size):
                 self.buttons_board[i][j].draw(self.window)
 
-    def draw_board(self):
-        for i in range(BOARD_SIZE + 1):
-            if i % 3:
-                pygame.draw.line(self.window, EXTRA_LINES_COLOR,
-                                 [HORIZONTAL_OFFSET + CELL_WIDTH * i, VERTICAL_OFFSET],
-                                 [HORIZONTAL_OFFSET + CELL_WIDTH * i, HEIGHT - VERTICAL_OFFSET],
+    def draw_board(self, win):
+        for i in range(self.size + 1):
+            if i % self.geometry.box_size:
+                pygame.draw.line(win, EXTRA_LINES_COLOR,
+                                 [HORIZONTAL_OFFSET + self.cell_width * i, VERTICAL_OFFSET],
+                                 [HORIZONTAL_OFFSET + self.cell_width * i, self.height - VERTICAL_OFFSET],
                                  LINE_WIDTH)
 
-        for i in range(BOARD_SIZE + 1):
-            if i % 3:
-                pygame.draw.line(self.window, EXTRA_LINES_COLOR,
-                                 [HORIZONTAL_OFFSET, VERTICAL_OFFSET + CELL_WIDTH * i],
-                                 [WIDTH - HORIZONTAL_OFFSET, VERTICAL_OFFSET + CELL_WIDTH * i],
+        for i in range(self.size + 1):
+            if i % self.geometry.box_size:
+                pygame.draw.line(win, EXTRA_LINES_COLOR,
+                                 [HORIZONTAL_OFFSET, VERTICAL_OFFSET + self.cell_width * i],
+                                 [self.width - HORIZONTAL_OFFSET, VERTICAL_OFFSET + self.cell_width * i],
                                  LINE_WIDTH)
 
-        for i in range(0, BOARD_SIZE + 1, 3):
-            pygame.draw.line(self.window, MAIN_LINES_COLOR,
-                             [HORIZONTAL_OFFSET + CELL_WIDTH * i, VERTICAL_OFFSET],
-                             [HORIZONTAL_OFFSET + CELL_WIDTH * i, HEIGHT - VERTICAL_OFFSET],
+        for i in range(0, self.size + 1, self.geometry.box_size):
+            pygame.draw.line(win, MAIN_LINES_COLOR,
+                             [HORIZONTAL_OFFSET + self.cell_width * i, VERTICAL_OFFSET],
+                             [HORIZONTAL_OFFSET + self.cell_width * i, self.height - VERTICAL_OFFSET],
                              LINE_WIDTH)
 
-        for i in range(0, BOARD_SIZE + 1, 3):
-            pygame.draw.line(self.window, MAIN_LINES_COLOR,
-                             [HORIZONTAL_OFFSET, VERTICAL_OFFSET + CELL_WIDTH * i],
-                             [WIDTH - HORIZONTAL_OFFSET, VERTICAL_OFFSET + CELL_WIDTH * i],
+        for i in range(0, self.size + 1, self.geometry.box_size):
+            pygame.draw.line(win, MAIN_LINES_COLOR,
+                             [HORIZONTAL_OFFSET, VERTICAL_OFFSET + self.cell_width * i],
+                             [self.width - HORIZONTAL_OFFSET, VERTICAL_OFFSET + self.cell_width * i],
                              LINE_WIDTH)
 
-    def draw_game_window(self):
-        self.window.fill(GAME_BG_COLOR)
+    def layers_key(self):
+        return (self.window.get_size(), MENU_BG_COLOR, GAME_BG_COLOR, MAIN_LINES_COLOR, EXTRA_LINES_COLOR)
+
+    def build_layers(self):
+        self.menu_background = pygame.Surface(self.window.get_size()).convert()
+        self.menu_background.fill(MENU_BG_COLOR)
+        self.menu_background.blit(self.logo, (self.width // 2 - self.logo.get_width() // 2, self.height // 9))
+        self.menu_background.blit(self.menu_title, (self.width // 2 - self.menu_title.get_width() // 2,
+                                                    self.height // 2 - self.menu_title.get_height() // 2))
+
+        self.game_background = pygame.Surface(self.window.get_size()).convert()
+        self.game_background.fill(GAME_BG_COLOR)
+        self.game_background.blit(self.play_title, (self.width // 2 - self.play_title.get_width() // 2,
+                                                    VERTICAL_OFFSET // 2 - self.play_title.get_height() // 2))
+        self.solve_button.draw(self.game_background)
+        self.exit_button.draw(self.game_background)
+
+        # grid lines go on a colorkeyed overlay so they can be blitted over the cells
+        self.grid_layer = pygame.Surface(self.window.get_size()).convert()
+        self.grid_layer.fill(GRID_LAYER_KEY)
+        self.grid_layer.set_colorkey(GRID_LAYER_KEY)
+        self.draw_board(self.grid_layer)
+
+        self.layers = self.layers_key()
+
+    def draw_cell(self, button):
+        rect = button.get_rect()
+        self.window.set_clip(rect)
+        button.draw(self.window)
+        self.window.blit(self.grid_layer, rect, rect)
+        self.window.set_clip(None)
+        return rect
+
+    def hud_text(self):
+        text = {
+            'mistakes': f"Mistakes: {self.mistakes}/{MAX_MISTAKES}",
+            'difficulty': self.difficulty,
+            'time': self.format_time(self.current_time)
+        }
+        if self.profiler.enabled:
+            text['profile'] = self.profiler.overlay(self.clock.get_fps(), self.search_nodes())
+        return text
+
+    def search_nodes(self):
+        # both solver backends, the animated solve included, and the uniqueness checks of generated puzzles
+        return solver.nodes + dlx.nodes + self.profiler.counters['generator nodes']
+
+    def hud_position(self, name, text):
+        y = VERTICAL_OFFSET - ADDITIONAL_TEXT_FONT_SIZE
+        if name == 'mistakes':
+            return (self.width - text.get_width() - 2 * HORIZONTAL_OFFSET, y)
+        if name == 'time':
+            return (self.width // 2 - text.get_width() // 2, y)
+        if name == 'profile':
+            return (HORIZONTAL_OFFSET // 3, 2)
+        return (2 * HORIZONTAL_OFFSET, y)
+
+    def draw_hud(self, full=False):
+        if full:
+            self.hud = {}
+        rects = []
+        self.window.set_clip(self.hud_rect)
+        for name, value in self.hud_text().items():
+            old = self.hud.get(name)
+            if old is not None:
+                if old[0] == value:
+                    continue
+                self.window.fill(GAME_BG_COLOR, old[1])
+                rects.append(old[1])
+            size = PROFILER_FONT_SIZE if name == 'profile' else ADDITIONAL_TEXT_FONT_SIZE
+            text = render_text(value, EXTRA_LINES_COLOR, DIGITS_FONT, size, False)
+            rect = self.window.blit(text, self.hud_position(name, text))
+            self.hud[name] = (value, rect)
+            rects.append(rect)
+        self.window.set_clip(None)
+        return rects
 
-        self.window.blit(self.play_title, (WIDTH // 2 - self.play_title.get_width() // 2,
-                                           VERTICAL_OFFSET // 2 - self.play_title.get_height() // 2))
+    def draw_game_window(self):
+        if self.layers != self.layers_key():
+            self.build_layers()
+        self.window.blit(self.game_background, (0, 0))
 
-        mistakes_text = self.additional_text_font.render(f"Mistakes: {self.mistakes}/{MAX_MISTAKES}",
-                                                         0, EXTRA_LINES_COLOR)
-        self.window.blit(mistakes_text, (WIDTH - mistakes_text.get_width() - 2 * HORIZONTAL_OFFSET, VERTICAL_OFFSET - ADDITIONAL_TEXT_FONT_SIZE))
+        self.draw_hud(True)
 
-        difficulty_text = self.additional_text_font.render(self.difficulty, 0, EXTRA_LINES_COLOR)
-        self.window.blit(difficulty_text, (2 * HORIZONTAL_OFFSET, VERTICAL_OFFSET - ADDITIONAL_TEXT_FONT_SIZE))
+        self.draw_cells()
+        self.window.blit(self.grid_layer, (0, 0))
+        pygame.display.update()
 
-        time_text = self.additional_text_font.render(self.format_time(self.current_time), 0 , EXTRA_LINES_COLOR)
-        self.window.blit(time_text, (WIDTH // 2 - time_text.get_width() // 2, VERTICAL_OFFSET - ADDITIONAL_TEXT_FONT_SIZE))
+    def update_game_window(self):
+        rects = self.draw_hud()
+        for row in self.buttons_board:
+            for button in row:
+                if button.is_dirty():
+                    rects.append(self.draw_cell(button))
+        for button in (self.solve_button, self.exit_button):
+            if button.is_dirty():
+                button.draw(self.window)
+                rects.append(button.get_rect())
+        return rects
 
-        self.draw_cells()
-        self.draw_board()
+    def render(self):
+        screen = (self.playing, self.choosing_diffculty)
+        if screen != self.screen:
+            self.screen = screen
+            if self.playing:
+                self.draw_game_window()
+            else:
+                self.draw_menu_window()
+            return
 
-        self.solve_button.draw(self.window)
-        self.exit_button.draw(self.window)
-        pygame.display.update()
+        if self.playing:
+            rects = self.update_game_window()
+        else:
+            rects = self.update_menu_window()
+        if rects:
+            pygame.display.update(rects)
 
     def format_time(self, time):
         secs = time % 60
@@ -415,207 +643,214 @@ class SudokuGame:
             result = result[:-1] + "0" + result[-1]
         return result
 
-    def time_from_str(self, time_str):
-        time = list(map(int, time_str.split(':')))
-        return time[0] * 60 + time[1]
-
     def fill_buttons(self):
-        for i in range(BOARD_SIZE):
-            for j in range(BOARD_SIZE):
-                if self.board[i][j]:
-                    self.buttons_board[i][j].text = str(self.board[i][j])
-                else:
-                    self.buttons_board[i][j].text = ''
+        self.digit_cells = {value: set() for value in range(1, self.size + 1)}
+        for i, value in enumerate(self.board.cells):
+            if value:
+                self.cell_buttons[i].text = grid.SYMBOLS[value - 1]
+                self.digit_cells[value].add(i)
+            else:
+                self.cell_buttons[i].text = ''
+        self.candidates.reset(self.board)
+        self.update_marks()
 
-    def start_new_game(self, difficulty):
-        self.solving = True
-        self.playing = True
-        self.mistakes = 0
-        self.clicked = (-1, -1)
+    def load_game(self, board, solution, difficulty, seconds=0, mistakes=0, solving=True):
+        self.solving = solving
         self.difficulty = difficulty
-        self.create_board(difficulty)
-
+        self.mistakes = mistakes
+        self.board = board
+        self.correct_board = solution
+        self.change_highlighting()
         self.fill_buttons()
+        self.start_time = time.time() - seconds
+        self.current_time = seconds
+        self.clock_ms = seconds * 1000
+        if self.log is not None:
+            self.log.game(board, solution, difficulty, seconds, mistakes, solving)
 
-        self.start_time = time.time()
-        self.current_time = self.start_time
+    def start_new_game(self, difficulty):
+        self.playing = True
+        self.create_board(difficulty)
+        self.load_game(self.board, self.correct_board, difficulty)
 
     def isSaved(self):
-        if os.path.getsize('last_game.pickle') > 0:
+        if os.path.exists(self.save_path) and os.path.getsize(self.save_path) > 0:
             return True
         return False
 
     def continue_game(self):
         try:
-            with open("last_game.pickle", 'rb') as file:
-                data = pickle.load(file)
-            self.solving = True
-            self.difficulty = data['difficulty']
-            if self.difficulty not in DIFFICULTIES:
-                raise ValueError
-            self.current_time = time.time()
-            self.start_time = self.current_time - self.time_from_str(data['time'])
-            self.mistakes = data['mistakes']
-            if self.mistakes > 2:
-                raise ValueError
-            self.board = data['board']
-            if not len(self.board) == BOARD_SIZE:
-                raise ValueError
-            for row in self.board:
-                if not len(row) == BOARD_SIZE:
-                    raise ValueError
-                for el in row:
-                    if not 0 <= el <= 9:
-                        raise ValueError
-            self.fill_buttons()
-            with open("last_game.pickle", 'wb') as file:
-                pass
-        except:
-            raise ValueError('Wrong data')
+            game = storage.read_game(self.save_path)
+            if game.board.geometry is not self.geometry or game.mistakes >= MAX_MISTAKES:
+                raise ValueError('Saved game does not fit this board')
+        except (OSError, ValueError):
+            storage.discard(self.save_path)
             return False
+        self.load_game(game.board, game.solution, game.difficulty, game.seconds, game.mistakes, game.solving)
+        storage.discard(self.save_path)
         return True
 
     def get_highscores(self):
         try:
-            # with open('highscores.txt') as file:
-            #     result = {}
-            #     for i in range(3):
-            #         highscore = file.readline().split()[1]
-            #         if highscore == '-':
-            #             result[DIFFICULTIES[i]] = None
-            #         else:
-            #             result[DIFFICULTIES[i]] = self.time_from_str(highscore)
-            #     return result
-            with open('highscores.pickle', 'rb') as file:
-                data = pickle.load(file)
-            if not len(data) == 3:
-                raise ValueError
-            for difficulty, time in data.items():
-                if difficulty not in DIFFICULTIES:
-                    raise ValueError
-            return data
-        except:
-            raise ValueError('Wrong data')
+            return storage.read_highscores(self.highscores_path)
+        except (OSError, ValueError):
+            return {difficulty: None for difficulty in DIFFICULTIES}
 
     def update_highscores(self):
-        # with open('highscores.txt', 'w') as file:
-        #     for difficulty, time in self.highscores.items():
-        #         file.write(f'{difficulty}: ')
-        #         if time is None:
-        #             file.write('-')
-        #         else:
-        #             file.write(self.format_time(time))
-        #         file.write('\n')
-        with open('highscores.pickle', 'wb') as file:
-            pickle.dump(self.highscores, file)
+        storage.write_highscores(self.highscores_path, self.highscores)
 
     def start(self):
         running = True
+        pygame.time.set_timer(TICK_EVENT, TICK_INTERVAL)
+        self.profiler.start()
 
         while running:
-            pos = pygame.mouse.get_pos()
-            if self.playing and self.find_next(self.board):
-                self.current_time = round(time.time() - self.start_time)
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    if self.playing and self.find_next(self.board) is not None:
-                        self.save_game()
-                    running = False
-                    break
-
-                if self.playing:
-                    if event.type == pygame.MOUSEBUTTONDOWN:
-                        for row in range(BOARD_SIZE):
-                            for col in range(BOARD_SIZE):
-                                if self.buttons_board[row][col].is_over(pos):
-                                    self.change_highlighting((row, col))
-                        if self.solve_button.is_over(pos):
-                            self.solve()
-                            self.solving = False
-                            self.change_highlighting()
-                        elif self.exit_button.is_over(pos):
-                            if self.find_next(self.board) is not None:
-                                self.save_game()
-                            self.playing = False
-                    elif event.type == pygame.KEYDOWN:
-                        if event.key in self.keys_dict:
-                            if self.keys_dict[event.key] == self.correct_board[self.clicked[0]][self.clicked[1]]:
-                                self.board[self.clicked[0]][self.clicked[1]] = self.keys_dict[event.key]
-                                self.buttons_board[self.clicked[0]][self.clicked[1]].text = str(self.keys_dict[event.key])
-                                self.buttons_board[self.clicked[0]][self.clicked[1]].text_color = GUESSED_COLOR
-                                if self.find_next(self.board) is None and self.solving:
-                                    if self.highscores[self.difficulty] is None or self.current_time < self.highscores[self.difficulty]:
-                                        self.highscores[self.difficulty] = self.current_time
-                                        self.update_highscores()
-                                    Tk().wm_withdraw()
-                                    result = messagebox.askyesno('Victory', f'You\'ve won on {self.difficulty} difficulty in {self.format_time(self.current_time)}.\nWould you like to play again?')
+            events = pygame.event.get()
+            if not events and self.screen is not None and self.solve_steps is None:
+                # nothing changed since the last frame, sleep until input or the next timer tick
+                events = [pygame.event.wait()] + pygame.event.get()
+            self.profiler.start_frame()
+            with self.profiler.section('events'):
+                pos = pygame.mouse.get_pos()
+                if self.playing and not self.board.is_complete():
+                    self.tick_clock()
+                for event in events:
+                    if event.type == pygame.VIDEOEXPOSE:
+                        self.screen = None
+
+                    if event.type == pygame.QUIT:
+                        self.stop_solve()
+                        if self.playing:
+                            self.record(eventlog.END, eventlog.EXITED)
+                        if self.playing and not self.board.is_complete():
+                            self.save_game()
+                        running = False
+                        break
+
+                    if self.playing:
+                        if event.type == pygame.MOUSEBUTTONDOWN:
+                            cell = self.cell_at(pos)
+                            if cell is not None:
+                                self.select(cell)
+                            if self.solve_button.is_over(pos):
+                                self.record(eventlog.SOLVE)
+                                if self.solve_steps is None:
+                                    self.solve()
+                                self.solving = False
+                                self.change_highlighting()
+                            elif self.exit_button.is_over(pos):
+                                self.record(eventlog.END, eventlog.EXITED)
+                                self.stop_solve()
+                                if not self.board.is_complete():
+                                    self.save_game()
+                                self.playing = False
+                        elif event.type == pygame.KEYDOWN:
+                            if event.key in self.keys_dict and not self.clicked == (-1, -1) and self.solve_steps is None:
+                                self.record(eventlog.DIGIT, self.keys_dict[event.key])
+                                outcome = self.enter_value(self.keys_dict[event.key])
+                                if outcome is not None:
+                                    self.record(eventlog.END, outcome)
+                                    if outcome == eventlog.VICTORY:
+                                        result = ask_yes_no('Victory', f'You\'ve won on {self.difficulty} difficulty in {self.format_time(self.current_time)}.\nWould you like to play again?')
+                                    else:
+                                        result = ask_yes_no('Loss', f'You\'ve lost\nWould you like to play again?')
                                     self.playing = False
                                     if result:
                                         self.choosing_diffculty = True
-                            else:
-                                if not self.board[self.clicked[0]][self.clicked[1]]:
-                                    self.mistakes += 1
-                                    if self.mistakes == MAX_MISTAKES:
-                                        Tk().wm_withdraw()
-                                        result = messagebox.askyesno('Loss', f'You\'ve lost\nWould you like to play again?')
-                                        self.playing = False
-                                        if result:
-                                            self.choosing_diffculty = True
-                        elif event.key == pygame.K_LEFT and self.clicked[1] > 0:
-                            self.change_highlighting((self.clicked[0], self.clicked[1] - 1))
-                        elif event.key == pygame.K_RIGHT and -1 < self.clicked[1] < 8:
-                            self.change_highlighting((self.clicked[0], self.clicked[1] + 1))
-                        elif event.key == pygame.K_UP and self.clicked[0] > 0:
-                            self.change_highlighting((self.clicked[0] - 1, self.clicked[1]))
-                        elif event.key == pygame.K_DOWN and -1 < self.clicked[0] < 8:
-                            self.change_highlighting((self.clicked[0] + 1, self.clicked[1]))
-                elif self.choosing_diffculty:
-                    if event.type == pygame.MOUSEMOTION:
-                        for button in self.difficulty_buttons:
-                            if button.is_over(pos) and self.choosing_diffculty:
-                                button.color = OVER_COLOR
-                                button.text_color = EXTRA_OVER_COLOR
-                                button.outline = EXTRA_OVER_COLOR
-                            else:
-                                button.color = MENU_BUTTON_COLOR
-                                button.text_color = MENU_EXTRA_BUTTON_COLOR
-                                button.outline = MENU_EXTRA_BUTTON_COLOR
-                    if event.type == pygame.MOUSEBUTTONDOWN:
-                        for button in self.difficulty_buttons:
-                            if self.choosing_diffculty and button.is_over(pos):
-                                self.choosing_diffculty = False
-                                self.start_new_game(button.text)
-                else:
-                    if event.type == pygame.MOUSEMOTION:
-                        for button in self.menu_buttons:
-                            if button.is_over(pos) and not self.choosing_diffculty:
-                                button.color = OVER_COLOR
-                                button.text_color = EXTRA_OVER_COLOR
-                                button.outline = EXTRA_OVER_COLOR
-                            else:
-                                button.color = MENU_BUTTON_COLOR
-                                button.text_color = MENU_EXTRA_BUTTON_COLOR
-                                button.outline = MENU_EXTRA_BUTTON_COLOR
-                    if event.type == pygame.MOUSEBUTTONDOWN:
-                        for button in self.menu_buttons:
-                            if not self.choosing_diffculty and button.is_over(pos):
-                                if button.text == MENU_BUTTON_TEXT[0] and self.isSaved():
-                                    self.continue_game()
-                                    self.playing = True
-                                    pass
-                                elif button.text == MENU_BUTTON_TEXT[1]:
-                                    self.choosing_diffculty = True
-
-            if self.playing:
-                self.draw_game_window()
-            else:
-                self.draw_menu_window()
+                            elif event.key == pygame.K_LEFT and self.clicked[1] > 0:
+                                self.select((self.clicked[0], self.clicked[1] - 1))
+                            elif event.key == pygame.K_RIGHT and -1 < self.clicked[1] < self.size - 1:
+                                self.select((self.clicked[0], self.clicked[1] + 1))
+                            elif event.key == pygame.K_UP and self.clicked[0] > 0:
+                                self.select((self.clicked[0] - 1, self.clicked[1]))
+                            elif event.key == pygame.K_DOWN and -1 < self.clicked[0] < self.size - 1:
+                                self.select((self.clicked[0] + 1, self.clicked[1]))
+                            elif event.key == HINT_KEY and self.solve_steps is None:
+                                self.show_hint()
+                            elif event.key == MARKS_KEY:
+                                self.toggle_marks()
+                    elif self.choosing_diffculty:
+                        if event.type == pygame.MOUSEMOTION:
+                            for button in self.difficulty_buttons:
+                                if button.is_over(pos) and self.choosing_diffculty:
+                                    button.color = OVER_COLOR
+                                    button.text_color = EXTRA_OVER_COLOR
+                                    button.outline = EXTRA_OVER_COLOR
+                                else:
+                                    button.color = MENU_BUTTON_COLOR
+                                    button.text_color = MENU_EXTRA_BUTTON_COLOR
+                                    button.outline = MENU_EXTRA_BUTTON_COLOR
+                        if event.type == pygame.MOUSEBUTTONDOWN:
+                            for button in self.difficulty_buttons:
+                                if self.choosing_diffculty and button.is_over(pos):
+                                    self.choosing_diffculty = False
+                                    self.start_new_game(button.text)
+                    else:
+                        if event.type == pygame.MOUSEMOTION:
+                            for button in self.menu_buttons:
+                                if button.is_over(pos) and not self.choosing_diffculty:
+                                    button.color = OVER_COLOR
+                                    button.text_color = EXTRA_OVER_COLOR
+                                    button.outline = EXTRA_OVER_COLOR
+                                else:
+                                    button.color = MENU_BUTTON_COLOR
+                                    button.text_color = MENU_EXTRA_BUTTON_COLOR
+                                    button.outline = MENU_EXTRA_BUTTON_COLOR
+                        if event.type == pygame.MOUSEBUTTONDOWN:
+                            for button in self.menu_buttons:
+                                if not self.choosing_diffculty and button.is_over(pos):
+                                    if button.text == MENU_BUTTON_TEXT[0] and self.isSaved():
+                                        if self.continue_game():
+                                            self.playing = True
+                                        else:
+                                            # the save was unreadable and is gone, redraw without Continue
+                                            self.screen = None
+                                    elif button.text == MENU_BUTTON_TEXT[1]:
+                                        self.choosing_diffculty = True
 
+            if self.solve_steps is not None:
+                with self.profiler.section('solve steps'):
+                    self.advance_solve()
+            with self.profiler.section('render'):
+                self.render()
+            if self.first_frame is None:
+                self.first_frame = time.perf_counter() - STARTED
+                self.profiler.add('first frame', self.first_frame)
+                # the generator thread competes for the interpreter, keep it off the first frame
+                if self.generate_ahead and running:
+                    self.pool.start()
+            self.profiler.end_frame()
+            self.clock.tick(FPS)
+
+        pygame.time.set_timer(TICK_EVENT, 0)
+        self.pool.stop()
+        if self.library is not None:
+            self.library.close()
+        if self.log is not None:
+            self.log.close()
+        close_dialogs()
+        self.profiler.stop()
         pygame.quit()
 
 
-def main():
-    SudokuGame().start()
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Sudoku game + solver')
+    parser.add_argument('--debug', action='store_true', help='time hot paths and show a profiler overlay')
+    parser.add_argument('--profile', metavar='FILE', default=None, help='write cProfile stats to FILE on exit')
+    parser.add_argument('--solve-speed', choices=SOLVE_SPEEDS, default=SOLVE_SPEED, help='how fast the Solve button plays back the search')
+    parser.add_argument('--box-size', type=int, choices=grid.BOX_SIZES, default=grid.BOX_SIZE,
+                        help='box size, 3 plays 9x9, 4 plays 16x16 and 5 plays 25x25')
+    parser.add_argument('--library', metavar='FILE', default=None, help='pick puzzles from a library built with library.py')
+    parser.add_argument('--record', metavar='FILE', default=None, help='append every game to this event log for replay.py')
+    args = parser.parse_args(argv)
+    try:
+        game = SudokuGame(debug=args.debug, profile_path=args.profile, solve_speed=args.solve_speed, box_size=args.box_size,
+                          library_path=args.library, record_path=args.record)
+    except (OSError, ValueError) as error:
+        # a missing, corrupt or wrong-sized library, or an event log that cannot be appended to
+        pygame.quit()
+        parser.exit(2, f'{error}\n')
+    game.start()
 
 if __name__ == '__main__':
     main()
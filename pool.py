@@ -0,0 +1,74 @@
+import threading
+from collections import deque
+
+POOL_DEPTH = 5
+LOW_WATERMARK = 2
+
+
+class PuzzlePool:
+
+    def __init__(self, generate, difficulties, depth=POOL_DEPTH, low_watermark=LOW_WATERMARK, generate_now=None):
+        self.generate = generate
+        # an empty queue makes the caller wait, so it may generate differently, faster
+        self.generate_now = generate_now or generate
+        self.depth = depth
+        self.low_watermark = min(low_watermark, depth - 1)
+        self.puzzles = {difficulty: deque() for difficulty in difficulties}
+        self.refilling = set()
+        self.condition = threading.Condition()
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        with self.condition:
+            if self.running:
+                return
+            self.running = True
+        self.thread = threading.Thread(target=self.run, name='puzzle-pool', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def size(self, difficulty):
+        with self.condition:
+            return len(self.puzzles[difficulty])
+
+    def get(self, difficulty):
+        with self.condition:
+            puzzles = self.puzzles[difficulty]
+            puzzle = puzzles.popleft() if puzzles else None
+            self.condition.notify()
+        if puzzle is None:
+            puzzle = self.generate_now(difficulty)
+        return puzzle
+
+    def next_difficulty(self):
+        # refill from the low watermark up to the full depth, emptiest queue first
+        best = None
+        for difficulty, puzzles in self.puzzles.items():
+            if difficulty in self.refilling and len(puzzles) >= self.depth:
+                self.refilling.discard(difficulty)
+            elif difficulty not in self.refilling and len(puzzles) <= self.low_watermark:
+                self.refilling.add(difficulty)
+            if difficulty in self.refilling and (best is None or len(puzzles) < len(self.puzzles[best])):
+                best = difficulty
+        return best
+
+    def run(self):
+        while True:
+            with self.condition:
+                difficulty = self.next_difficulty()
+                while self.running and difficulty is None:
+                    self.condition.wait()
+                    difficulty = self.next_difficulty()
+                if not self.running:
+                    return
+            puzzle = self.generate(difficulty)
+            with self.condition:
+                self.puzzles[difficulty].append(puzzle)
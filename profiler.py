@@ -0,0 +1,128 @@
+import sys
+import time
+import cProfile
+from collections import defaultdict, deque
+from contextlib import nullcontext
+from functools import wraps
+
+FRAME_HISTORY = 240
+RATE_INTERVAL = 1.0
+
+NULL_SECTION = nullcontext()
+
+
+class Section:
+
+    __slots__ = ('profiler', 'name', 'start')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.add(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class Profiler:
+
+    def __init__(self, enabled=False, profile_path=None):
+        self.enabled = enabled
+        self.totals = defaultdict(float)
+        self.calls = defaultdict(int)
+        self.counters = defaultdict(int)
+        self.frames = deque(maxlen=FRAME_HISTORY)
+        self.frame_start = None
+        self.rate_sample = (time.perf_counter(), 0)
+        self.rate = 0.0
+        self.patched = []
+        self.profile_path = profile_path
+        self.cprofile = cProfile.Profile() if profile_path else None
+
+    def start(self):
+        if self.cprofile is not None:
+            self.cprofile.enable()
+
+    def stop(self):
+        if self.cprofile is not None:
+            self.cprofile.disable()
+            self.cprofile.dump_stats(self.profile_path)
+        for owner, name, original in reversed(self.patched):
+            if original is None:
+                delattr(owner, name)
+            else:
+                setattr(owner, name, original)
+        self.patched = []
+        if self.enabled:
+            self.report()
+
+    def section(self, name):
+        if not self.enabled:
+            return NULL_SECTION
+        return Section(self, name)
+
+    def add(self, name, elapsed):
+        self.totals[name] += elapsed
+        self.calls[name] += 1
+
+    def count(self, name, amount=1):
+        if self.enabled:
+            self.counters[name] += amount
+
+    def wrap(self, owner, name, label=None):
+        # patch the attribute only while profiling, so a disabled profiler costs nothing
+        if not self.enabled:
+            return
+        func = getattr(owner, name)
+        label = label or name
+
+        @wraps(func)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.add(label, time.perf_counter() - start)
+
+        self.patched.append((owner, name, vars(owner).get(name)))
+        setattr(owner, name, timed)
+
+    def start_frame(self):
+        if self.enabled:
+            self.frame_start = time.perf_counter()
+
+    def end_frame(self):
+        if self.enabled and self.frame_start is not None:
+            self.frames.append(time.perf_counter() - self.frame_start)
+            self.frame_start = None
+
+    def percentile(self, q):
+        if not self.frames:
+            return 0.0
+        ordered = sorted(self.frames)
+        return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+    def node_rate(self, nodes):
+        now = time.perf_counter()
+        last_time, last_nodes = self.rate_sample
+        if now - last_time >= RATE_INTERVAL:
+            self.rate = (nodes - last_nodes) / (now - last_time)
+            self.rate_sample = (now, nodes)
+        return self.rate
+
+    def overlay(self, fps, nodes):
+        return (f"{fps:.0f} fps  p50 {self.percentile(50) * 1000:.1f}  p99 {self.percentile(99) * 1000:.1f} ms  "
+                f"nodes {nodes} ({self.node_rate(nodes):.0f}/s)")
+
+    def report(self, file=sys.stderr):
+        print(f"{'section':24} {'calls':>8} {'total ms':>10} {'mean ms':>9}", file=file)
+        for name in sorted(self.totals, key=self.totals.get, reverse=True):
+            total = self.totals[name] * 1000
+            print(f"{name:24} {self.calls[name]:8} {total:10.1f} {total / self.calls[name]:9.3f}", file=file)
+        for name, value in sorted(self.counters.items()):
+            print(f"{name:24} {value:8}", file=file)
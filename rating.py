@@ -0,0 +1,256 @@
+from collections import namedtuple
+
+import grid
+from grid import BOX_SIZE, BOARD_SIZE, CELLS, ROW, COL, BOX, ROWS, COLS, BOXES, UNITS, PEERS
+
+ALL = ((1 << BOARD_SIZE) - 1) << 1
+DIGITS = tuple(1 << d for d in range(1, BOARD_SIZE + 1))
+DIGIT = {1 << d: d for d in range(1, BOARD_SIZE + 1)}
+POPCOUNT = tuple(bin(m).count('1') for m in range(ALL + 1))
+
+# (name, weight) in the order a human solver would try them
+TECHNIQUES = (
+    ('Hidden Single', 1),
+    ('Naked Single', 2),
+    ('Pointing', 4),
+    ('Claiming', 4),
+    ('Naked Pair', 6),
+    ('Hidden Pair', 8),
+    ('Naked Triple', 10),
+    ('X-Wing', 14),
+    ('Trial and Error', 25)
+)
+GUESS = len(TECHNIQUES) - 1
+
+
+def segments():
+    # box/line intersections grouped by box (pointing) and by line (claiming), each
+    # paired with the cells of the other house that lie outside the intersection
+    box_segments = []
+    for box in BOXES:
+        group = []
+        for lines, house in ((ROWS, ROW), (COLS, COL)):
+            for index in sorted({house[i] for i in box}):
+                cells = tuple(i for i in box if house[i] == index)
+                group.append((cells, tuple(i for i in lines[index] if i not in cells)))
+        box_segments.append(tuple(group[:BOX_SIZE]))
+        box_segments.append(tuple(group[BOX_SIZE:]))
+    line_segments = []
+    for line in ROWS + COLS:
+        group = []
+        for index in sorted({BOX[i] for i in line}):
+            cells = tuple(i for i in line if BOX[i] == index)
+            group.append((cells, tuple(i for i in BOXES[index] if i not in cells)))
+        line_segments.append(tuple(group))
+    return tuple(box_segments), tuple(line_segments)
+
+
+BOX_SEGMENTS, LINE_SEGMENTS = segments()
+
+Rating = namedtuple('Rating', 'level technique score solved')
+
+
+class LogicalSolver:
+
+    def __init__(self, board):
+        self.cells = grid.flatten(board)
+        self.cand = [0] * CELLS
+        self.valid = True
+        self.steps = []
+        rows = [0] * BOARD_SIZE
+        cols = [0] * BOARD_SIZE
+        boxes = [0] * BOARD_SIZE
+        for i, value in enumerate(self.cells):
+            if value:
+                bit = 1 << value
+                if (rows[ROW[i]] | cols[COL[i]] | boxes[BOX[i]]) & bit:
+                    self.valid = False
+                rows[ROW[i]] |= bit
+                cols[COL[i]] |= bit
+                boxes[BOX[i]] |= bit
+        for i, value in enumerate(self.cells):
+            if not value:
+                self.cand[i] = ALL & ~(rows[ROW[i]] | cols[COL[i]] | boxes[BOX[i]])
+                if not self.cand[i]:
+                    self.valid = False
+
+        self.techniques = (
+            self.hidden_single,
+            self.naked_single,
+            self.pointing,
+            self.claiming,
+            self.naked_pair,
+            self.hidden_pair,
+            self.naked_triple,
+            self.x_wing
+        )
+
+    def place(self, i, bit):
+        cand = self.cand
+        if not cand[i] & bit:
+            self.valid = False
+            return
+        self.cells[i] = DIGIT[bit]
+        cand[i] = 0
+        for p in PEERS[i]:
+            if cand[p] & bit:
+                cand[p] &= ~bit
+                if not cand[p] and not self.cells[p]:
+                    self.valid = False
+
+    def eliminate(self, cells, mask):
+        cand = self.cand
+        changed = False
+        for i in cells:
+            if cand[i] & mask:
+                cand[i] &= ~mask
+                changed = True
+                if not cand[i]:
+                    self.valid = False
+        return changed
+
+    def hidden_single(self):
+        cand = self.cand
+        found = False
+        for unit in UNITS:
+            once = twice = 0
+            for i in unit:
+                twice |= once & cand[i]
+                once |= cand[i]
+            single = once & ~twice
+            while single:
+                bit = single & -single
+                single ^= bit
+                for i in unit:
+                    if cand[i] & bit:
+                        self.place(i, bit)
+                        found = True
+                        break
+        return found
+
+    def naked_single(self):
+        cand = self.cand
+        found = False
+        for i in range(CELLS):
+            mask = cand[i]
+            if mask and not mask & (mask - 1):
+                self.place(i, mask)
+                found = True
+        return found
+
+    def pointing(self):
+        return self.locked_candidates(BOX_SEGMENTS)
+
+    def claiming(self):
+        return self.locked_candidates(LINE_SEGMENTS)
+
+    def locked_candidates(self, groups):
+        # a digit confined to one segment of a group can be removed from the rest of the crossing house
+        cand = self.cand
+        changed = False
+        for segments in groups:
+            masks = []
+            for cells, rest in segments:
+                mask = 0
+                for i in cells:
+                    mask |= cand[i]
+                masks.append(mask)
+            for k, (cells, rest) in enumerate(segments):
+                others = 0
+                for j, mask in enumerate(masks):
+                    if j != k:
+                        others |= mask
+                locked = masks[k] & ~others
+                if locked:
+                    changed |= self.eliminate(rest, locked)
+        return changed
+
+    def naked_pair(self):
+        cand = self.cand
+        changed = False
+        for unit in UNITS:
+            pairs = {}
+            for i in unit:
+                if POPCOUNT[cand[i]] == 2:
+                    pairs.setdefault(cand[i], []).append(i)
+            for mask, cells in pairs.items():
+                if len(cells) == 2:
+                    changed |= self.eliminate([i for i in unit if i not in cells], mask)
+        return changed
+
+    def hidden_pair(self):
+        cand = self.cand
+        changed = False
+        for unit in UNITS:
+            places = {}
+            for bit in DIGITS:
+                cells = tuple(i for i in unit if cand[i] & bit)
+                if len(cells) == 2:
+                    places.setdefault(cells, 0)
+                    places[cells] |= bit
+            for cells, mask in places.items():
+                if POPCOUNT[mask] == 2:
+                    for i in cells:
+                        if cand[i] & ~mask:
+                            cand[i] &= mask
+                            changed = True
+        return changed
+
+    def naked_triple(self):
+        cand = self.cand
+        changed = False
+        for unit in UNITS:
+            cells = [i for i in unit if 2 <= POPCOUNT[cand[i]] <= 3]
+            for a in range(len(cells)):
+                for b in range(a + 1, len(cells)):
+                    for c in range(b + 1, len(cells)):
+                        mask = cand[cells[a]] | cand[cells[b]] | cand[cells[c]]
+                        if POPCOUNT[mask] == 3:
+                            triple = (cells[a], cells[b], cells[c])
+                            changed |= self.eliminate([i for i in unit if i not in triple], mask)
+        return changed
+
+    def x_wing(self):
+        cand = self.cand
+        changed = False
+        for lines, across, cross_lines in ((ROWS, COL, COLS), (COLS, ROW, ROWS)):
+            for bit in DIGITS:
+                seen = {}
+                for index, line in enumerate(lines):
+                    positions = tuple(across[i] for i in line if cand[i] & bit)
+                    if len(positions) != 2:
+                        continue
+                    if positions in seen:
+                        wing = (seen[positions], index)
+                        for position in positions:
+                            cells = [i for i in cross_lines[position] if (ROW[i] if across is COL else COL[i]) not in wing]
+                            changed |= self.eliminate(cells, bit)
+                    else:
+                        seen[positions] = index
+        return changed
+
+    def step(self):
+        for level, technique in enumerate(self.techniques):
+            if technique():
+                self.steps.append(level)
+                return level
+        return None
+
+    def run(self):
+        while self.valid and 0 in self.cells:
+            if self.step() is None:
+                return False
+        return self.valid and 0 not in self.cells
+
+
+def rate(board):
+    solver = LogicalSolver(board)
+    solved = solver.valid and solver.run()
+    if solved:
+        level = max(solver.steps, default=0)
+    else:
+        level = GUESS
+    score = sum(TECHNIQUES[step][1] for step in solver.steps)
+    if not solved:
+        score += TECHNIQUES[GUESS][1] * solver.cells.count(0)
+    return Rating(level, TECHNIQUES[level][0], score, solved)
@@ -0,0 +1,104 @@
+import os
+import sys
+import time
+import argparse
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import eventlog
+from main import SudokuGame
+from grid import DIFFICULTIES
+
+OUTCOMES = {
+    None: 'unfinished',
+    eventlog.EXITED: 'exited',
+    eventlog.VICTORY: 'won',
+    eventlog.LOSS: 'lost'
+}
+
+
+class ReplayGame(SudokuGame):
+
+    # the game logic without frames or dialogs, highscores stay in memory
+
+    def __init__(self, box_size):
+        super().__init__(box_size=box_size)
+        self.highscores = {difficulty: None for difficulty in DIFFICULTIES}
+        self.new_highscores = 0
+
+    def update_highscores(self):
+        self.new_highscores += 1
+
+
+def replay_session(game, session):
+    # feeds the recorded input through the game logic as fast as it goes, returns how the game ended
+    saved = session.game
+    game.playing = True
+    game.load_game(saved.board.copy(), saved.solution, saved.difficulty, saved.seconds, saved.mistakes, saved.solving)
+    outcome = eventlog.EXITED
+    for kind, clock, value in session.events:
+        game.clock_ms = clock
+        game.current_time = round(clock / 1000)
+        if kind == eventlog.SELECT:
+            game.change_highlighting(divmod(value, game.size))
+        elif kind == eventlog.DIGIT:
+            result = game.enter_value(value)
+            if result is not None:
+                outcome = result
+                break
+        elif kind == eventlog.SOLVE:
+            game.solving = False
+            game.finish_solve(game.correct_board.cells)
+            game.change_highlighting()
+    game.playing = False
+    return outcome
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Replay event logs recorded with main.py --record headlessly.')
+    parser.add_argument('logs', nargs='+', help='event log files')
+    parser.add_argument('-n', '--repeat', type=int, default=1, help='replay every session this many times')
+    parser.add_argument('-v', '--verbose', action='store_true', help='print one line per replayed session')
+    args = parser.parse_args(argv)
+
+    paths = [os.path.abspath(path) for path in args.logs]
+    # the game loads its images relative to the repository
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    try:
+        sessions = [session for path in paths for session in eventlog.read_sessions(path)]
+    except (OSError, ValueError) as error:
+        parser.exit(2, f'{error}\n')
+
+    games = {}
+    outcomes = dict.fromkeys(OUTCOMES, 0)
+    diverged = 0
+    start = time.perf_counter()
+    for i in range(args.repeat):
+        for n, session in enumerate(sessions):
+            box_size = session.game.board.geometry.box_size
+            if box_size not in games:
+                games[box_size] = ReplayGame(box_size)
+            game = games[box_size]
+            outcome = replay_session(game, session)
+            # a session the log saw end has to end the same way again
+            if session.outcome is not None and outcome != session.outcome:
+                diverged += 1
+            else:
+                outcome = session.outcome
+            outcomes[outcome] += 1
+            if args.verbose and i == 0:
+                print(f'{n:6} {session.game.difficulty:8} {OUTCOMES[outcome]:10} {len(session.events):5} events  '
+                      f'{game.mistakes} mistakes  {game.format_time(game.current_time)}')
+    elapsed = time.perf_counter() - start
+
+    replayed = len(sessions) * args.repeat
+    new_highscores = sum(game.new_highscores for game in games.values())
+    print(f'{replayed} sessions in {elapsed:.2f}s ({replayed / max(elapsed, 1e-9):.0f} sessions/s): '
+          + ', '.join(f'{count} {OUTCOMES[outcome]}' for outcome, count in outcomes.items())
+          + f', {new_highscores} new highscores, {diverged} diverged', file=sys.stderr)
+    return 1 if diverged else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
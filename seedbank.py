@@ -0,0 +1,140 @@
+import os
+import sys
+import zlib
+import time
+import random
+import struct
+import argparse
+from operator import itemgetter
+
+import grid
+import solver
+from board import Board
+from storage import CHECKSUM, pack_cells, packed_size, unpack_cells, write_atomic
+
+MAGIC = b'SDKB'
+VERSION = 1
+# magic, version, box size, grid count
+HEADER = struct.Struct('<4sBBI')
+
+BANK_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'seeds')
+# grids per bank built by default, big boards take longer to fill and pack into more bytes
+BANK_SIZES = {3: 4096, 4: 512, 5: 128}
+
+# search nodes per cell a fill may spend before it starts over
+FILL_NODES = 4
+
+BANKS = {}
+
+
+def default_path(geometry):
+    return os.path.join(BANK_DIR, f'{geometry.size}x{geometry.size}.bank')
+
+
+def fill_grid(rng, geometry):
+    # the diagonal boxes share no unit, so random digits there always extend to a full grid;
+    # a search that runs long starts over from new boxes rather than wait out a heavy tail
+    box_size = geometry.box_size
+    while True:
+        cells = bytearray(geometry.cells)
+        for band in range(box_size):
+            for i, value in zip(geometry.boxes[band * box_size + band], rng.sample(range(1, geometry.size + 1), geometry.size)):
+                cells[i] = value
+        filler = solver.BitmaskSolver(Board(cells, geometry))
+        filler.node_limit = FILL_NODES * geometry.cells
+        try:
+            if filler.count(1):
+                return bytes(filler.solution)
+        except solver.SearchLimit:
+            pass
+
+
+class SeedBank:
+
+    # completed grids packed back to back, each deal shuffles one of them into a fresh equivalent grid
+
+    def __init__(self, path):
+        with open(path, 'rb') as file:
+            data = file.read()
+        if len(data) < HEADER.size + CHECKSUM.size:
+            raise ValueError('Truncated seed bank')
+        body = data[:-CHECKSUM.size]
+        if zlib.crc32(body) != CHECKSUM.unpack_from(data, len(body))[0]:
+            raise ValueError('Checksum mismatch')
+        magic, version, box_size, count = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION or box_size not in grid.BOX_SIZES:
+            raise ValueError('Not a seed bank of this version')
+        self.geometry = grid.geometry(box_size)
+        self.record_size = packed_size(self.geometry)
+        if not count or len(body) != HEADER.size + count * self.record_size:
+            raise ValueError('Wrong grid count')
+        self.count = count
+        self.data = body[HEADER.size:]
+
+    def grid(self, n):
+        start = n * self.record_size
+        return unpack_cells(self.data[start:start + self.record_size], self.geometry)
+
+    def deal(self, rng):
+        # bands, rows inside them, stacks, columns inside them, transposition and digits all
+        # shuffled at once: one gather through the combined cell order, then one relabel
+        g = self.geometry
+        box_size, size = g.box_size, g.size
+        rows = [band * box_size + row for band in rng.sample(range(box_size), box_size)
+                for row in rng.sample(range(box_size), box_size)]
+        cols = [stack * box_size + col for stack in rng.sample(range(box_size), box_size)
+                for col in rng.sample(range(box_size), box_size)]
+        if rng.random() < 0.5:
+            order = [row + col * size for row in rows for col in cols]
+        else:
+            order = [row * size + col for row in rows for col in cols]
+        labels = bytearray(range(256))
+        labels[1:size + 1] = rng.sample(range(1, size + 1), size)
+        cells = bytes(itemgetter(*order)(self.grid(rng.randrange(self.count))))
+        return Board(cells.translate(labels), g)
+
+
+def bank(geometry):
+    # the installed bank for this board size, loaded once per process, None if there is none
+    if geometry.box_size not in BANKS:
+        try:
+            BANKS[geometry.box_size] = SeedBank(default_path(geometry))
+        except (OSError, ValueError):
+            BANKS[geometry.box_size] = None
+    return BANKS[geometry.box_size]
+
+
+def build(path, count, geometry, rng):
+    grids = set()
+    records = []
+    while len(records) < count:
+        cells = fill_grid(rng, geometry)
+        if cells not in grids:
+            grids.add(cells)
+            records.append(pack_cells(cells, geometry))
+    body = HEADER.pack(MAGIC, VERSION, geometry.box_size, count) + b''.join(records)
+    write_atomic(path, body + CHECKSUM.pack(zlib.crc32(body)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Build the bank of completed grids new puzzles start from.')
+    parser.add_argument('output', nargs='?', default=None, help='bank file (default: the one the generator loads)')
+    parser.add_argument('-n', '--count', type=int, default=None, help='grids in the bank')
+    parser.add_argument('-b', '--box-size', type=int, choices=grid.BOX_SIZES, default=grid.BOX_SIZE,
+                        help='box size, 3 for 9x9, 4 for 16x16 and 5 for 25x25 grids')
+    parser.add_argument('-s', '--seed', type=int, default=None, help='RNG seed')
+    args = parser.parse_args(argv)
+
+    geometry = grid.geometry(args.box_size)
+    path = args.output or default_path(geometry)
+    count = args.count or BANK_SIZES[args.box_size]
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    start = time.perf_counter()
+    build(path, count, geometry, random.Random(args.seed))
+    elapsed = time.perf_counter() - start
+    print(f'{count} grids in {elapsed:.2f}s written to {path}', file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
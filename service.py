@@ -0,0 +1,165 @@
+import os
+import sys
+import stat
+import time
+import queue
+import argparse
+import threading
+import socketserver
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import grid
+import solver
+from board import Board
+
+CHUNK_SIZE = 64
+# lines read ahead of the solvers, the reader blocks once this many are waiting
+BUFFER_LINES = 4096
+NO_SOLUTION = '-'
+
+
+def solve_line(line):
+    try:
+        board = Board.from_rows(grid.from_line(line))
+    except (ValueError, IndexError):
+        return NO_SOLUTION
+    if not solver.solve(board):
+        return NO_SOLUTION
+    return grid.to_line(board)
+
+
+def solve_chunk(lines):
+    return [solve_line(line) for line in lines]
+
+
+def read_ahead(source, lines):
+    try:
+        for line in source:
+            if line.strip():
+                lines.put(line)
+    finally:
+        lines.put(None)
+
+
+def stream(source, output, executor, workers, chunk_size=CHUNK_SIZE, buffer_lines=BUFFER_LINES):
+    # solves every line of source and writes the results to output in input order,
+    # a partial chunk goes out as soon as the input runs dry so interactive clients get answers
+    lines = queue.Queue(maxsize=buffer_lines)
+    reader = threading.Thread(target=read_ahead, args=(source, lines), name='service-reader', daemon=True)
+    reader.start()
+    max_pending = 2 * workers
+    pending = deque()
+    solved = 0
+    done = False
+    while not done or pending:
+        chunk = []
+        while not done and len(chunk) < chunk_size:
+            try:
+                line = lines.get(block=not chunk and not pending)
+            except queue.Empty:
+                break
+            if line is None:
+                done = True
+            else:
+                chunk.append(line)
+        if chunk:
+            pending.append(executor.submit(solve_chunk, chunk))
+
+        # wait for the oldest chunk when the pool is full or there is nothing else to do
+        wait = len(pending) >= max_pending or not chunk
+        while pending and (wait or pending[0].done()):
+            results = pending.popleft().result()
+            output.write(''.join(result + '\n' for result in results))
+            solved += len(results)
+            wait = len(pending) >= max_pending
+        output.flush()
+    reader.join()
+    return solved
+
+
+class SolveHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        source = self.request.makefile('r', encoding='ascii', errors='replace')
+        output = self.request.makefile('w', encoding='ascii')
+        try:
+            stream(source, output, self.server.executor, self.server.workers, self.server.chunk_size, self.server.buffer_lines)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            source.close()
+            output.close()
+
+
+class TCPSolveServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class UnixSolveServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+
+def make_server(args, executor):
+    if args.tcp:
+        host, _, port = args.tcp.rpartition(':')
+        server = TCPSolveServer((host or 'localhost', int(port)), SolveHandler)
+    else:
+        # a socket left behind by an earlier run would make bind fail
+        if os.path.exists(args.unix) and stat.S_ISSOCK(os.stat(args.unix).st_mode):
+            os.remove(args.unix)
+        server = UnixSolveServer(args.unix, SolveHandler)
+    server.executor = executor
+    server.workers = args.workers
+    server.chunk_size = args.chunk_size
+    server.buffer_lines = args.buffer
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Solve Sudoku puzzles headlessly, one puzzle per line.')
+    parser.add_argument('-i', '--input', default='-', help="puzzle file, '-' for stdin")
+    parser.add_argument('-o', '--output', default='-', help="solution file, '-' for stdout")
+    server_group = parser.add_mutually_exclusive_group()
+    server_group.add_argument('--tcp', metavar='[HOST:]PORT', default=None, help='serve connections on a local TCP port instead')
+    server_group.add_argument('--unix', metavar='PATH', default=None, help='serve connections on a Unix socket instead')
+    parser.add_argument('-j', '--workers', type=int, default=os.cpu_count() or 1, help='solver processes (default: all cores)')
+    parser.add_argument('-c', '--chunk-size', type=int, default=CHUNK_SIZE, help='puzzles per task sent to a solver process')
+    parser.add_argument('-b', '--buffer', type=int, default=BUFFER_LINES, help='input lines buffered ahead of the solvers')
+    args = parser.parse_args(argv)
+    if args.tcp and ':' not in args.tcp:
+        args.tcp = ':' + args.tcp
+
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        # fork the solvers before any reader thread exists, a child forked while a reader
+        # holds the stdin lock would hang closing its copy of stdin
+        executor.submit(int).result()
+        if args.tcp or args.unix:
+            with make_server(args, executor) as server:
+                print(f'serving on {server.server_address}', file=sys.stderr, flush=True)
+                try:
+                    server.serve_forever()
+                except KeyboardInterrupt:
+                    pass
+            if args.unix:
+                os.remove(args.unix)
+            return 0
+
+        source = sys.stdin if args.input == '-' else open(args.input)
+        output = sys.stdout if args.output == '-' else open(args.output, 'w')
+        start = time.perf_counter()
+        try:
+            solved = stream(source, output, executor, args.workers, args.chunk_size, args.buffer)
+        finally:
+            if source is not sys.stdin:
+                source.close()
+            if output is not sys.stdout:
+                output.close()
+        elapsed = time.perf_counter() - start
+        print(f'{solved} puzzles in {elapsed:.2f}s ({solved / max(elapsed, 1e-9):.0f} puzzles/s)', file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
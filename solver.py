@@ -0,0 +1,334 @@
+import grid
+
+# search nodes expanded by solve() and count_solutions() since import
+nodes = 0
+
+
+class SearchLimit(Exception):
+    pass
+
+
+class BitmaskSolver:
+
+    def __init__(self, board):
+        self.cells = grid.flatten(board)
+        self.geometry = g = grid.geometry_for(len(self.cells))
+        self.row, self.col, self.box = g.row, g.col, g.box
+        self.rows = [0] * g.size
+        self.cols = [0] * g.size
+        self.boxes = [0] * g.size
+        # candidate mask per cell, a filled cell keeps just its own digit
+        self.cand = [0] * g.cells
+        # places[u * stride + d]: cells of unit u that hold or can still take digit d
+        self.stride = g.size + 1
+        self.places = [0] * (len(g.units) * self.stride)
+        self.trail = []
+        self.history = []
+        self.changes = []
+        self.queue = []
+        self.solution = None
+        self.nodes = 0
+        self.node_limit = None
+        self.valid = True
+        row, col, box = self.row, self.col, self.box
+        for i, value in enumerate(self.cells):
+            if value:
+                bit = 1 << value
+                if (self.rows[row[i]] | self.cols[col[i]] | self.boxes[box[i]]) & bit:
+                    self.valid = False
+                self.rows[row[i]] |= bit
+                self.cols[col[i]] |= bit
+                self.boxes[box[i]] |= bit
+        for i in range(g.cells):
+            self.reset(i)
+
+    def candidates(self, i):
+        return self.geometry.all & ~(self.rows[self.row[i]] | self.cols[self.col[i]] | self.boxes[self.box[i]])
+
+    def placed(self, u):
+        size = self.geometry.size
+        if u < size:
+            return self.rows[u]
+        if u < 2 * size:
+            return self.cols[u - size]
+        return self.boxes[u - 2 * size]
+
+    def reset(self, i):
+        # recompute the candidates of i from the unit masks, outside of any search
+        value = self.cells[i]
+        mask = 1 << value if value else self.candidates(i)
+        self.count_places(i, mask & ~self.cand[i], 1)
+        self.count_places(i, self.cand[i] & ~mask, -1)
+        self.cand[i] = mask
+
+    def count_places(self, i, mask, delta):
+        places, stride, digit = self.places, self.stride, self.geometry.digit
+        units = self.geometry.cell_units[i]
+        while mask:
+            bit = mask & -mask
+            mask ^= bit
+            d = digit[bit]
+            for u in units:
+                places[u * stride + d] += delta
+
+    def eliminate(self, i, mask):
+        # drop mask from the candidates of i, queueing any single it leaves behind
+        cand, places, stride, digit = self.cand, self.places, self.stride, self.geometry.digit
+        self.changes.append((i, cand[i]))
+        left = cand[i] & ~mask
+        cand[i] = left
+        if not self.cells[i]:
+            if not left:
+                return False
+            if not left & (left - 1):
+                self.queue.append((i, left))
+        while mask:
+            bit = mask & -mask
+            mask ^= bit
+            d = digit[bit]
+            for u in self.geometry.cell_units[i]:
+                k = u * stride + d
+                places[k] -= 1
+                if places[k] < 2:
+                    if not places[k]:
+                        return False
+                    if not self.placed(u) & bit:
+                        for j in self.geometry.units[u]:
+                            if cand[j] & bit:
+                                self.queue.append((j, bit))
+                                break
+        return True
+
+    def assign(self, i, bit):
+        cells, cand = self.cells, self.cand
+        if cells[i]:
+            return 1 << cells[i] == bit
+        if not cand[i] & bit:
+            return False
+        self.trail.append(i)
+        self.history.append(len(self.changes))
+        cells[i] = self.geometry.digit[bit]
+        self.rows[self.row[i]] |= bit
+        self.cols[self.col[i]] |= bit
+        self.boxes[self.box[i]] |= bit
+        if cand[i] != bit and not self.eliminate(i, cand[i] & ~bit):
+            return False
+        for p in self.geometry.peers[i]:
+            if cand[p] & bit and not self.eliminate(p, bit):
+                return False
+        return True
+
+    def undo(self, mark):
+        self.queue.clear()
+        trail = self.trail
+        if len(trail) <= mark:
+            return
+        cells, cand, changes = self.cells, self.cand, self.changes
+        row, col, box = self.row, self.col, self.box
+        start = self.history[mark]
+        while len(changes) > start:
+            i, mask = changes.pop()
+            self.count_places(i, mask & ~cand[i], 1)
+            cand[i] = mask
+        while len(trail) > mark:
+            i = trail.pop()
+            bit = ~(1 << cells[i])
+            cells[i] = 0
+            self.rows[row[i]] &= bit
+            self.cols[col[i]] &= bit
+            self.boxes[box[i]] &= bit
+        del self.history[mark:]
+
+    def seed(self):
+        # queue every single of the current position, searches only follow changes from here
+        cells, cand, places, stride = self.cells, self.cand, self.places, self.stride
+        for i in range(len(cells)):
+            if not cells[i]:
+                mask = cand[i]
+                if not mask:
+                    return False
+                if not mask & (mask - 1):
+                    self.queue.append((i, mask))
+        for u, unit in enumerate(self.geometry.units):
+            placed = self.placed(u)
+            for d in range(1, stride):
+                count = places[u * stride + d]
+                if count < 2:
+                    if not count:
+                        return False
+                    bit = 1 << d
+                    if not placed & bit:
+                        for j in unit:
+                            if cand[j] & bit:
+                                self.queue.append((j, bit))
+                                break
+        return True
+
+    def propagate(self):
+        queue = self.queue
+        while queue:
+            i, bit = queue.pop()
+            if not self.assign(i, bit):
+                return False
+        return True
+
+    def choose(self):
+        # the empty cell with the fewest candidates, or -1 once the grid is full
+        cells, cand, popcount = self.cells, self.cand, self.geometry.popcount
+        best = -1
+        best_count = self.geometry.size + 1
+        for i in range(len(cells)):
+            if not cells[i]:
+                count = popcount[cand[i]]
+                if count < best_count:
+                    best, best_count = i, count
+                    if count <= 2:
+                        break
+        return best
+
+    def search(self, limit):
+        mark = len(self.trail)
+        if not self.propagate():
+            self.undo(mark)
+            return 0
+
+        best = self.choose()
+        if best < 0:
+            if self.solution is None:
+                self.solution = list(self.cells)
+            self.undo(mark)
+            return 1
+
+        found = 0
+        branch = len(self.trail)
+        best_mask = self.cand[best]
+        while best_mask and found < limit:
+            bit = best_mask & -best_mask
+            best_mask ^= bit
+            self.nodes += 1
+            if self.nodes == self.node_limit:
+                raise SearchLimit
+            if self.assign(best, bit):
+                found += self.search(limit - found)
+            self.undo(branch)
+        self.undo(mark)
+        return found
+
+    def clear(self, i):
+        value = self.cells[i]
+        bit = ~(1 << value)
+        self.cells[i] = 0
+        self.rows[self.row[i]] &= bit
+        self.cols[self.col[i]] &= bit
+        self.boxes[self.box[i]] &= bit
+        self.reset(i)
+        for p in self.geometry.peers[i]:
+            self.reset(p)
+        return value
+
+    def restore(self, i, value):
+        bit = 1 << value
+        self.cells[i] = value
+        self.rows[self.row[i]] |= bit
+        self.cols[self.col[i]] |= bit
+        self.boxes[self.box[i]] |= bit
+        self.reset(i)
+        for p in self.geometry.peers[i]:
+            self.reset(p)
+
+    def has_other_solution(self, i, value, max_nodes=None):
+        # the grid was unique with value at i, so after clearing i any second
+        # solution has to put a different digit there
+        mask = self.candidates(i) & ~(1 << value)
+        self.node_limit = None if max_nodes is None else self.nodes + max_nodes
+        try:
+            while mask:
+                bit = mask & -mask
+                mask ^= bit
+                mark = len(self.trail)
+                found = 0
+                if self.assign(i, bit) and self.seed():
+                    try:
+                        found = self.search(1)
+                    except SearchLimit:
+                        # out of budget: uniqueness is unproven, so report it as ambiguous
+                        found = 1
+                self.undo(mark)
+                if found:
+                    return True
+            return False
+        finally:
+            self.node_limit = None
+
+    def cleared(self, mark):
+        events = [(i, 0, 'clear') for i in reversed(self.trail[mark:])]
+        self.undo(mark)
+        return events
+
+    def steps(self):
+        # same search as search(1), but yields every (cell, value, action) it makes
+        mark = len(self.trail)
+        consistent = self.propagate()
+        for i in self.trail[mark:]:
+            yield (i, self.cells[i], 'place')
+        if not consistent:
+            yield from self.cleared(mark)
+            return False
+
+        best = self.choose()
+        if best < 0:
+            self.solution = list(self.cells)
+            return True
+
+        branch = len(self.trail)
+        best_mask = self.cand[best]
+        while best_mask:
+            bit = best_mask & -best_mask
+            best_mask ^= bit
+            self.nodes += 1
+            consistent = self.assign(best, bit)
+            yield (best, self.geometry.digit[bit], 'try')
+            if consistent and (yield from self.steps()):
+                return True
+            yield from self.cleared(branch)
+        yield from self.cleared(mark)
+        return False
+
+    def count(self, limit):
+        if not self.valid or not self.seed():
+            return 0
+        return self.search(limit)
+
+
+def solve(board):
+    global nodes
+    solver = BitmaskSolver(board)
+    found = solver.count(1)
+    nodes += solver.nodes
+    if not found:
+        return False
+    grid.fill(board, solver.solution)
+    return True
+
+
+def solve_steps(board):
+    global nodes
+    solver = BitmaskSolver(board)
+    if not solver.valid or not solver.seed():
+        return None
+    # yields ((row, col), value, action) and returns the solved cells, or None;
+    # nodes are counted even when the player stops the animation halfway
+    try:
+        for i, value, action in solver.steps():
+            yield (solver.row[i], solver.col[i]), value, action
+    finally:
+        nodes += solver.nodes
+    return solver.solution
+
+
+def count_solutions(board, limit=2):
+    global nodes
+    solver = BitmaskSolver(board)
+    found = solver.count(limit)
+    nodes += solver.nodes
+    return found
@@ -0,0 +1,118 @@
+import os
+import zlib
+import struct
+from collections import namedtuple
+
+import grid
+from board import Board
+from grid import DIFFICULTIES
+
+MAGIC = b'SDKU'
+VERSION = 1
+GAME = 1
+HIGHSCORES = 2
+
+# magic, version, record kind, box size, difficulty, mistakes, solving flag, elapsed seconds
+HEADER = struct.Struct('<4sBBBBBBI')
+CHECKSUM = struct.Struct('<I')
+SCORES = struct.Struct(f'<{len(DIFFICULTIES)}I')
+NO_SCORE = 0xFFFFFFFF
+
+SavedGame = namedtuple('SavedGame', 'board solution difficulty seconds mistakes solving')
+
+
+def packed_size(geometry):
+    # two cells per byte while every value fits a nibble, one byte per cell on bigger boards
+    if geometry.size < 16:
+        return (geometry.cells + 1) // 2
+    return geometry.cells
+
+
+def pack_cells(cells, geometry):
+    if geometry.size >= 16:
+        return bytes(cells)
+    cells = bytes(cells) + bytes(len(cells) % 2)
+    return bytes(high << 4 | low for high, low in zip(cells[::2], cells[1::2]))
+
+
+def unpack_cells(data, geometry):
+    if geometry.size >= 16:
+        return bytes(data)
+    cells = bytearray(2 * len(data))
+    cells[::2] = bytes(byte >> 4 for byte in data)
+    cells[1::2] = bytes(byte & 0x0F for byte in data)
+    return cells[:geometry.cells]
+
+
+def write_atomic(path, data):
+    # a crash mid-write leaves the old file in place instead of a truncated one
+    temp = path + '.tmp'
+    with open(temp, 'wb') as file:
+        file.write(data)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp, path)
+
+
+def read_record(path, kind):
+    with open(path, 'rb') as file:
+        data = file.read()
+    view = memoryview(data)
+    if len(data) < HEADER.size + CHECKSUM.size:
+        raise ValueError('Truncated file')
+    body, (checksum,) = view[:-CHECKSUM.size], CHECKSUM.unpack_from(view, len(data) - CHECKSUM.size)
+    if zlib.crc32(body) != checksum:
+        raise ValueError('Checksum mismatch')
+    header = HEADER.unpack_from(view)
+    if header[0] != MAGIC or header[1] != VERSION or header[2] != kind:
+        raise ValueError('Not a save file of this version')
+    return header, view[HEADER.size:len(data) - CHECKSUM.size]
+
+
+def discard(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def write_game(path, board, solution, difficulty, seconds, mistakes, solving):
+    geometry = board.geometry
+    header = HEADER.pack(MAGIC, VERSION, GAME, geometry.box_size, DIFFICULTIES.index(difficulty),
+                         mistakes, solving, seconds)
+    body = header + pack_cells(board.cells, geometry) + pack_cells(solution.cells, geometry)
+    write_atomic(path, body + CHECKSUM.pack(zlib.crc32(body)))
+
+
+def read_game(path):
+    header, payload = read_record(path, GAME)
+    box_size, difficulty, mistakes, solving, seconds = header[3:]
+    if box_size not in grid.BOX_SIZES or difficulty >= len(DIFFICULTIES):
+        raise ValueError('Corrupt header')
+    geometry = grid.geometry(box_size)
+    size = packed_size(geometry)
+    if len(payload) != 2 * size:
+        raise ValueError('Wrong board size')
+    board = Board(unpack_cells(payload[:size], geometry), geometry)
+    solution = Board(unpack_cells(payload[size:], geometry), geometry)
+    # the solution has to be a complete grid that agrees with every filled cell
+    houses = solution.rows + solution.cols + solution.boxes
+    if any(mask != geometry.all for mask in houses):
+        raise ValueError('Invalid solution')
+    if any(value and value != answer for value, answer in zip(board.cells, solution.cells)):
+        raise ValueError('Board does not match its solution')
+    return SavedGame(board, solution, DIFFICULTIES[difficulty], seconds, mistakes, bool(solving))
+
+
+def write_highscores(path, highscores):
+    times = [NO_SCORE if highscores.get(difficulty) is None else highscores[difficulty] for difficulty in DIFFICULTIES]
+    body = HEADER.pack(MAGIC, VERSION, HIGHSCORES, 0, 0, 0, 0, 0) + SCORES.pack(*times)
+    write_atomic(path, body + CHECKSUM.pack(zlib.crc32(body)))
+
+
+def read_highscores(path):
+    header, payload = read_record(path, HIGHSCORES)
+    if len(payload) != SCORES.size:
+        raise ValueError('Wrong highscore count')
+    times = SCORES.unpack_from(payload)
+    return {difficulty: None if time == NO_SCORE else time for difficulty, time in zip(DIFFICULTIES, times)}
@@ -0,0 +1,85 @@
+import os
+import sys
+import random
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import grid
+import canonical
+import library
+import generator
+
+PUZZLE = ('530070000600195000098000060800060003400803001'
+          '700020006060000280000419005000080079')
+
+
+def transform(cells, geometry, rng):
+    # a random mix of every symmetry the canonical form folds away
+    box_size, size = geometry.box_size, geometry.size
+    rows = [band * box_size + row for band in rng.sample(range(box_size), box_size)
+            for row in rng.sample(range(box_size), box_size)]
+    cols = [stack * box_size + col for stack in rng.sample(range(box_size), box_size)
+            for col in rng.sample(range(box_size), box_size)]
+    labels = [0] + rng.sample(range(1, size + 1), size)
+    transposed = rng.random() < 0.5
+    result = bytearray(geometry.cells)
+    for i, row in enumerate(rows):
+        for j, col in enumerate(cols):
+            source = col * size + row if transposed else row * size + col
+            result[i * size + j] = labels[cells[source]]
+    return bytes(result)
+
+
+def puzzles(count, box_size=grid.BOX_SIZE):
+    puzzle_generator = generator.PuzzleGenerator(random.Random(box_size), box_size)
+    return [bytes(puzzle_generator.generate_candidate(difficulty)[0].cells)
+            for i in range(count) for difficulty in grid.DIFFICULTIES]
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_transforms_share_a_canonical_form(seed):
+    rng = random.Random(seed)
+    cells = bytes(grid.flatten(grid.from_line(PUZZLE)))
+    form = canonical.canonical(cells)
+    for i in range(5):
+        assert canonical.canonical(transform(cells, grid.STANDARD, rng)) == form
+
+
+def test_generated_puzzles_share_a_canonical_form():
+    rng = random.Random(1)
+    for cells in puzzles(4):
+        key = canonical.canonical_hash(cells)
+        for i in range(5):
+            assert canonical.canonical_hash(transform(cells, grid.STANDARD, rng)) == key
+
+
+def test_canonical_form_is_a_transform():
+    # the form keeps the clue count and every digit keeps its count, under some relabelling
+    cells = bytes(grid.flatten(grid.from_line(PUZZLE)))
+    form = canonical.canonical(cells)
+    assert sum(1 for value in form if value) == sum(1 for value in cells if value)
+    assert sorted(form.count(digit) for digit in range(1, 10)) == sorted(cells.count(digit) for digit in range(1, 10))
+
+
+def test_different_puzzles_differ():
+    forms = {canonical.canonical(cells) for cells in puzzles(4)}
+    assert len(forms) == 4 * len(grid.DIFFICULTIES)
+
+
+def test_wrong_length():
+    with pytest.raises(ValueError):
+        canonical.Canonicalizer().canonical(bytes(80))
+
+
+@pytest.mark.parametrize('box_size', [4, 5])
+def test_big_boards_fall_back_to_relabelling(box_size):
+    geometry = grid.geometry(box_size)
+    rng = random.Random(box_size)
+    cells = puzzles(1, box_size)[0]
+    labels = [0] + rng.sample(range(1, geometry.size + 1), geometry.size)
+    relabelled = bytes(labels[value] for value in cells)
+    assert library.canonical_key(relabelled, geometry) == library.canonical_key(cells, geometry)
+    with pytest.raises(ValueError):
+        canonical.canonicalizer(geometry)
@@ -0,0 +1,130 @@
+import os
+import sys
+import zlib
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import grid
+import storage
+from board import Board
+
+SOLUTION = ('534678912672195348198342567859761423426853791'
+            '713924856961537284287419635345286179')
+PUZZLE = ('530070000600195000098000060800060003400803001'
+          '700020006060000280000419005000080079')
+
+
+def boards():
+    return Board.from_rows(grid.from_line(PUZZLE)), Board.from_rows(grid.from_line(SOLUTION))
+
+
+def saved_game(tmp_path):
+    path = str(tmp_path / 'last_game.sav')
+    board, solution = boards()
+    storage.write_game(path, board, solution, 'Medium', 125, 2, False)
+    with open(path, 'rb') as file:
+        return path, bytearray(file.read())
+
+
+def rewrite(path, body):
+    # a body with a valid checksum, so the checks past the CRC are what has to catch it
+    with open(path, 'wb') as file:
+        file.write(bytes(body) + storage.CHECKSUM.pack(zlib.crc32(body)))
+
+
+def test_game_round_trip(tmp_path):
+    path, _ = saved_game(tmp_path)
+    game = storage.read_game(path)
+    assert grid.to_line(game.board) == PUZZLE
+    assert grid.to_line(game.solution) == SOLUTION
+    assert (game.difficulty, game.seconds, game.mistakes, game.solving) == ('Medium', 125, 2, False)
+
+
+def test_highscores_round_trip(tmp_path):
+    path = str(tmp_path / 'highscores.sav')
+    storage.write_highscores(path, {'Easy': 61, 'Medium': None, 'Hard': 300})
+    assert storage.read_highscores(path) == {'Easy': 61, 'Medium': None, 'Hard': 300}
+
+
+@pytest.mark.parametrize('length', [0, 1, storage.HEADER.size, storage.HEADER.size + storage.CHECKSUM.size, -1])
+def test_truncated_file(tmp_path, length):
+    path, data = saved_game(tmp_path)
+    with open(path, 'wb') as file:
+        file.write(data[:length])
+    with pytest.raises(ValueError):
+        storage.read_game(path)
+
+
+def test_truncated_payload_with_valid_checksum(tmp_path):
+    path, data = saved_game(tmp_path)
+    rewrite(path, data[:-storage.CHECKSUM.size - 1])
+    with pytest.raises(ValueError):
+        storage.read_game(path)
+
+
+@pytest.mark.parametrize('offset', [0, storage.HEADER.size, -1])
+def test_bad_checksum(tmp_path, offset):
+    path, data = saved_game(tmp_path)
+    data[offset] ^= 0x01
+    with open(path, 'wb') as file:
+        file.write(data)
+    with pytest.raises(ValueError, match='Checksum'):
+        storage.read_game(path)
+
+
+@pytest.mark.parametrize('field, value', [(1, 2), (2, storage.HIGHSCORES), (3, 7), (4, 3)])
+def test_bad_header(tmp_path, field, value):
+    path, data = saved_game(tmp_path)
+    header = list(storage.HEADER.unpack_from(data))
+    header[field] = value
+    rewrite(path, storage.HEADER.pack(*header) + data[storage.HEADER.size:-storage.CHECKSUM.size])
+    with pytest.raises(ValueError):
+        storage.read_game(path)
+
+
+@pytest.mark.parametrize('cell', [0, 2, 40, 80])
+@pytest.mark.parametrize('part', ['board', 'solution'])
+def test_out_of_range_nibble(tmp_path, cell, part):
+    path, data = saved_game(tmp_path)
+    size = storage.packed_size(grid.STANDARD)
+    offset = storage.HEADER.size + (size if part == 'solution' else 0) + cell // 2
+    # 0xF is no digit of a 9x9 board
+    data[offset] |= 0x0F if cell % 2 else 0xF0
+    rewrite(path, data[:-storage.CHECKSUM.size])
+    with pytest.raises(ValueError):
+        storage.read_game(path)
+
+
+def test_solution_that_is_no_grid(tmp_path):
+    path, data = saved_game(tmp_path)
+    board, solution = boards()
+    cells = bytearray(solution.cells)
+    # swapping two digits of a row keeps every row valid but breaks two columns
+    cells[0], cells[1] = cells[1], cells[0]
+    body = data[:storage.HEADER.size] + storage.pack_cells(board.cells, grid.STANDARD) + storage.pack_cells(cells, grid.STANDARD)
+    rewrite(path, body)
+    with pytest.raises(ValueError, match='Invalid solution'):
+        storage.read_game(path)
+
+
+def test_board_solution_mismatch(tmp_path):
+    path, data = saved_game(tmp_path)
+    board, solution = boards()
+    cells = bytearray(board.cells)
+    cells[0] = 1 if solution.cells[0] != 1 else 2
+    body = data[:storage.HEADER.size] + storage.pack_cells(cells, grid.STANDARD) + storage.pack_cells(solution.cells, grid.STANDARD)
+    rewrite(path, body)
+    with pytest.raises(ValueError, match='does not match'):
+        storage.read_game(path)
+
+
+def test_wrong_highscore_count(tmp_path):
+    path = str(tmp_path / 'highscores.sav')
+    storage.write_highscores(path, {})
+    with open(path, 'rb') as file:
+        data = file.read()
+    rewrite(path, data[:-storage.CHECKSUM.size - 4])
+    with pytest.raises(ValueError):
+        storage.read_highscores(path)